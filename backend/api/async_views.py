@@ -0,0 +1,198 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Value
+from django.http import Http404, HttpResponse
+from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+from django_filters.utils import translate_validation
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+
+from api.authentication import CachedTokenAuthentication
+from api.caching import (add_validators, is_not_modified,
+                         response_data_cache, version_validators)
+from api.filters import RecipeFilter
+from api.pagination import CustomPaginator
+from api.search import ingredient_index
+from api.serializers import (IngredientSerializer, RecipeListSerializer,
+                             TagSerializer, UserInfoSerializer,
+                             UserSubscribesSerializer, get_recipes_limit)
+from api.exports import stream_async
+from api.views import (RecipeViewSet, UserViewSet, recipe_queryset,
+                       shopping_cart_response)
+from recieps.models import DataVersion, Ingredient, Tag
+from users.models import User
+
+READ_METHODS = ('GET', 'HEAD')
+
+authenticator = CachedTokenAuthentication()
+renderer = JSONRenderer()
+
+
+def render(response):
+    if not isinstance(response, Response):
+        return response
+    rendered = HttpResponse(renderer.render(response.data),
+                            status=response.status_code,
+                            content_type=renderer.media_type)
+    for name, value in response.headers.items():
+        if name.lower() != 'content-type':
+            rendered[name] = value
+    return rendered
+
+
+def async_read_view(view, write_view, authenticated=False):
+    async def dispatch(request, *args, **kwargs):
+        if request.method not in READ_METHODS:
+            return await sync_to_async(write_view)(request, *args, **kwargs)
+        request = Request(request, authenticators=(authenticator,))
+        try:
+            request.user, request.auth = (
+                await authenticator.aauthenticate(request)
+                or (AnonymousUser(), None))
+            if authenticated and not request.user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            response = await view(request, *args, **kwargs)
+        except Exception as exc:
+            response = exception_handler(exc, {'request': request})
+            if response is None:
+                raise
+            if isinstance(exc, (exceptions.NotAuthenticated,
+                                exceptions.AuthenticationFailed)):
+                response['WWW-Authenticate'] = (
+                    authenticator.authenticate_header(request))
+        return render(response)
+    return csrf_exempt(dispatch)
+
+
+async def get_or_404(queryset, pk):
+    try:
+        return await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches '
+                      f'the given query.')
+
+
+async def versioned_response(name, request, get_data):
+    data_version = await DataVersion.aget(name)
+    etag, last_modified = version_validators(name, data_version)
+    if is_not_modified(request, etag, last_modified):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        key = (request.get_full_path(), data_version.version)
+        data = response_data_cache.get(key)
+        if data is None:
+            data = await get_data()
+            response_data_cache.set(key, data)
+        response = Response(data)
+    return add_validators(response, etag, last_modified)
+
+
+def filter_recipes(filterset):
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+async def recipe_list(request):
+    filterset = RecipeFilter(request.query_params,
+                             recipe_queryset(request.user),
+                             request=request)
+    if filterset.filters.keys() & request.query_params.keys():
+        queryset = await sync_to_async(filter_recipes)(filterset)
+    else:
+        queryset = filterset.queryset
+    paginator = CustomPaginator()
+    page = await paginator.apaginate_queryset(queryset, request,
+                                              RecipeViewSet)
+    serializer = RecipeListSerializer(page, many=True,
+                                      context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
+
+
+async def recipe_detail(request, pk):
+    recipe = await get_or_404(recipe_queryset(request.user), pk)
+    return Response(RecipeListSerializer(
+        recipe, context={'request': request}).data)
+
+
+async def tag_list(request):
+    async def get_data():
+        return TagSerializer([tag async for tag in Tag.objects.all()],
+                             many=True).data
+    return await versioned_response('tags', request, get_data)
+
+
+async def tag_detail(request, pk):
+    async def get_data():
+        return TagSerializer(await get_or_404(Tag.objects.all(), pk)).data
+    return await versioned_response('tags', request, get_data)
+
+
+async def ingredient_list(request):
+    async def get_data():
+        return IngredientSerializer(
+            await ingredient_index.asearch(
+                request.query_params.get('name', '')),
+            many=True).data
+    return await versioned_response('ingredients', request, get_data)
+
+
+async def ingredient_detail(request, pk):
+    async def get_data():
+        return IngredientSerializer(
+            await get_or_404(Ingredient.objects.all(), pk)).data
+    return await versioned_response('ingredients', request, get_data)
+
+
+async def subscriptions(request):
+    authors = User.objects.filter(author__user=request.user).annotate(
+        is_subscribed=Value(True)
+    )
+    paginator = CustomPaginator()
+    page = await paginator.apaginate_queryset(authors, request, UserViewSet)
+    limit = get_recipes_limit(request)
+    recipes = [recipe async for recipe
+               in UserViewSet.recent_recipes(page, limit)] if limit else ()
+    UserViewSet.attach_recent_recipes(page, recipes)
+    serializer = UserSubscribesSerializer(page, many=True,
+                                          context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
+
+
+async def download_shopping_cart(request):
+    return shopping_cart_response(request, stream_async)
+
+
+async def me(request):
+    user = request.user
+    user.is_subscribed = False
+    return Response(UserInfoSerializer(
+        user, context={'request': request}).data)
+
+
+ASYNC_READ_ROUTES = (
+    ('recipes/', 'recipe-list', recipe_list, False),
+    ('recipes/<int:pk>/', 'recipe-detail', recipe_detail, False),
+    ('tags/', 'tag-list', tag_list, False),
+    ('tags/<int:pk>/', 'tag-detail', tag_detail, False),
+    ('ingredients/', 'ingredient-list', ingredient_list, False),
+    ('ingredients/<int:pk>/', 'ingredient-detail', ingredient_detail,
+     False),
+    ('users/subscriptions/', 'users-subscriptions', subscriptions, True),
+    ('users/me/', 'users-me', me, True),
+    ('recipes/download_shopping_cart/', 'recipe-download-shopping-cart',
+     download_shopping_cart, True),
+)
+
+
+def async_read_urlpatterns(router_urls):
+    write_views = {url.name: url.callback for url in router_urls}
+    return [
+        path(route, async_read_view(view, write_views[name], authenticated),
+             name=name)
+        for route, name, view, authenticated in ASYNC_READ_ROUTES
+    ]
@@ -0,0 +1,132 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (TokenAuthentication,
+                                           get_authorization_header)
+
+from api.constants import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL
+from foodgram_backend.metrics import registry
+
+TOKEN_CACHE_STATS = {
+    'hits': 'Token lookups served from the cache',
+    'misses': 'Token lookups that went to the database',
+    'evictions': 'Tokens evicted from the cache by size limit',
+    'invalidations': 'Tokens removed from the cache by data changes',
+}
+
+for stat, description in TOKEN_CACHE_STATS.items():
+    registry.register_counter(f'foodgram_token_cache_{stat}_total',
+                              description)
+
+
+class TokenCache:
+    def __init__(self, size=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+        self.user_keys = {}
+        self.stats = dict.fromkeys(TOKEN_CACHE_STATS, 0)
+
+    def count(self, stat, amount=1):
+        self.stats[stat] += amount
+        registry.increment(f'foodgram_token_cache_{stat}_total', amount)
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None and item[2] < time.monotonic():
+                self.pop(key)
+                item = None
+            if item is None:
+                self.count('misses')
+                return None
+            self.items.move_to_end(key)
+            self.count('hits')
+            return item[:2]
+
+    def set(self, key, user, token):
+        with self.lock:
+            self.items[key] = (user, token, time.monotonic() + self.ttl)
+            self.items.move_to_end(key)
+            self.user_keys.setdefault(user.pk, set()).add(key)
+            while len(self.items) > self.size:
+                self.pop(next(iter(self.items)))
+                self.count('evictions')
+
+    def pop(self, key):
+        user, _, _ = self.items.pop(key)
+        keys = self.user_keys.get(user.pk, set())
+        keys.discard(key)
+        if not keys:
+            self.user_keys.pop(user.pk, None)
+
+    def invalidate(self, key):
+        with self.lock:
+            if key in self.items:
+                self.pop(key)
+                self.count('invalidations')
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            keys = self.user_keys.pop(user_id, set())
+            for key in keys:
+                self.items.pop(key, None)
+            if keys:
+                self.count('invalidations', len(keys))
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.user_keys.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            user, token = cached
+            return copy.copy(user), token
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+        return copy.copy(user), token
+
+    async def aauthenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. No credentials provided.'))
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain '
+                  'spaces.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain '
+                  'invalid characters.'))
+        cached = token_cache.get(key)
+        if cached is None:
+            model = self.get_model()
+            try:
+                token = await model.objects.select_related('user').aget(
+                    key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(
+                    _('User inactive or deleted.'))
+            token_cache.set(key, token.user, token)
+            cached = token.user, token
+        user, token = cached
+        return copy.copy(user), token
@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.constants import REFERENCE_CACHE_MAX_AGE, REFERENCE_CACHE_SIZE
+from recieps.models import DataVersion
+
+
+class ResponseDataCache:
+    def __init__(self, size=REFERENCE_CACHE_SIZE):
+        self.size = size
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            data = self.items.get(key)
+            if data is not None:
+                self.items.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        with self.lock:
+            self.items[key] = data
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+
+response_data_cache = ResponseDataCache()
+
+
+class VersionedCacheMixin:
+    version_name = None
+
+    def list(self, request, *args, **kwargs):
+        return self.versioned_response(super().list, request,
+                                       *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.versioned_response(super().retrieve, request,
+                                       *args, **kwargs)
+
+    def versioned_response(self, render, request, *args, **kwargs):
+        data_version = DataVersion.get(self.version_name)
+        etag, last_modified = version_validators(self.version_name,
+                                                 data_version)
+        if is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = (request.get_full_path(), data_version.version)
+            data = response_data_cache.get(key)
+            if data is None:
+                response = render(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                response_data_cache.set(key, response.data)
+            else:
+                response = Response(data)
+        return add_validators(response, etag, last_modified)
+
+
+def version_validators(name, data_version):
+    return (f'"{name}-{data_version.version}"',
+            int(data_version.updated_at.timestamp()))
+
+
+def add_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True,
+                        max_age=REFERENCE_CACHE_MAX_AGE)
+    return response
+
+
+def is_not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return (if_none_match.strip() == '*' or etag in [
+            tag.strip().removeprefix('W/')
+            for tag in if_none_match.split(',')
+        ])
+    if_modified_since = parse_http_date_safe(
+        request.headers.get('If-Modified-Since'))
+    return (if_modified_since is not None
+            and last_modified <= if_modified_since)
@@ -1,2 +1,22 @@
 PAGE_SIZE = 6
 MAX_PAGE_SIZE = 15
+KEYSET_ORDERING = ('-created_at', '-id')
+USER_KEYSET_ORDERING = ('id',)
+FEED_KEYSET_ORDERING = ('-created_at', '-recipe_id')
+SEARCH_CONFIGS = ('russian', 'english')
+RECIPE_FTS_TABLE = 'recieps_recipe_fts'
+SHOPPING_LIST_TITLE = 'Список покупок:'
+SHOPPING_LIST_CHUNK_SIZE = 500
+SHOPPING_LIST_DEFAULT_FORMAT = 'txt'
+PDF_PAGE_SIZE = (595, 842)
+PDF_MARGIN = 50
+PDF_FONT_SIZE = 12
+PDF_LINE_HEIGHT = 20
+MAX_RECIPES_LIMIT = 30
+REFERENCE_CACHE_MAX_AGE = 60
+REFERENCE_CACHE_SIZE = 256
+TOKEN_CACHE_TTL = 30
+TOKEN_CACHE_SIZE = 10000
+MAX_BATCH_SIZE = 100
+PANTRY_INDEX_TTL = 300
+MAX_PANTRY_SIZE = 100
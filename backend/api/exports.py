@@ -0,0 +1,279 @@
+import csv
+import io
+import os
+import zlib
+from functools import lru_cache
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from fontTools import subset
+from fontTools.ttLib import TTFont
+
+from api.constants import (PDF_FONT_SIZE, PDF_LINE_HEIGHT, PDF_MARGIN,
+                           PDF_PAGE_SIZE, SHOPPING_LIST_CHUNK_SIZE,
+                           SHOPPING_LIST_TITLE)
+from recieps.models import ShoppingCartIngredient
+
+
+def shopping_list_rows(user):
+    return ShoppingCartIngredient.objects.filter(user=user).order_by(
+        'ingredient__name'
+    ).values_list(
+        'ingredient__name', 'amount', 'ingredient__measurement_unit'
+    ).iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+
+
+async def stream_async(chunks):
+    chunks = iter(chunks)
+    take = sync_to_async(
+        lambda: list(islice(chunks, SHOPPING_LIST_CHUNK_SIZE)))
+    while True:
+        batch = await take()
+        if not batch:
+            return
+        for chunk in batch:
+            yield chunk
+
+
+def render_txt(rows):
+    yield f'{SHOPPING_LIST_TITLE}\n'
+    for name, amount, measurement_unit in rows:
+        yield f'{name} - {amount} {measurement_unit}\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class PDFFont:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.data = file.read()
+        font = TTFont(io.BytesIO(self.data))
+        scale = 1000 / font['head'].unitsPerEm
+        glyph_ids = {name: glyph_id for glyph_id, name
+                     in enumerate(font.getGlyphOrder())}
+        self.glyphs = {code: glyph_ids[name]
+                       for code, name in font.getBestCmap().items()}
+        self.widths = [round(font['hmtx'][name][0] * scale)
+                       for name in font.getGlyphOrder()]
+        head, os2 = font['head'], font['OS/2']
+        self.bbox = [round(value * scale) for value in (
+            head.xMin, head.yMin, head.xMax, head.yMax)]
+        self.ascent = round(os2.sTypoAscender * scale)
+        self.descent = round(os2.sTypoDescender * scale)
+        self.cap_height = round(getattr(os2, 'sCapHeight', 0) * scale
+                                or self.ascent)
+        self.name = font['name'].getDebugName(6).replace(' ', '')
+
+    def encode(self, text, used):
+        glyph_ids = [self.glyphs.get(ord(char), 0) for char in text]
+        used.update((glyph_id, char) for glyph_id, char
+                    in zip(glyph_ids, text) if glyph_id)
+        return ''.join(f'{glyph_id:04X}' for glyph_id in glyph_ids)
+
+    def subset(self, glyph_ids):
+        options = subset.Options()
+        options.retain_gids = True
+        options.layout_features = []
+        options.notdef_outline = True
+        options.drop_tables += ['FFTM']
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(gids=glyph_ids)
+        font = TTFont(io.BytesIO(self.data))
+        subsetter.subset(font)
+        buffer = io.BytesIO()
+        font.save(buffer)
+        return buffer.getvalue()
+
+
+@lru_cache(maxsize=None)
+def load_pdf_font(path):
+    return PDFFont(path)
+
+
+def pdf_font_available():
+    return bool(settings.SHOPPING_LIST_FONT
+                and os.path.exists(settings.SHOPPING_LIST_FONT))
+
+
+def render_pdf_pages(lines, font, used):
+    width, height = PDF_PAGE_SIZE
+    lines_per_page = (height - 2 * PDF_MARGIN) // PDF_LINE_HEIGHT
+    page = []
+    for line in lines:
+        page.append(line)
+        if len(page) == lines_per_page:
+            yield draw_pdf_page(page, font, used, height)
+            page = []
+    if page:
+        yield draw_pdf_page(page, font, used, height)
+
+
+def draw_pdf_page(lines, font, used, height):
+    content = [
+        'BT',
+        f'/F1 {PDF_FONT_SIZE} Tf',
+        f'{PDF_LINE_HEIGHT} TL',
+        f'{PDF_MARGIN} {height - PDF_MARGIN - PDF_FONT_SIZE} Td',
+    ]
+    content += [f'<{font.encode(line, used)}> Tj T*' for line in lines]
+    content.append('ET')
+    return '\n'.join(content).encode()
+
+
+TO_UNICODE_HEADER = (
+    '/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n'
+    '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> '
+    'def\n/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n'
+    '1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n'
+)
+TO_UNICODE_FOOTER = (
+    'endcmap\nCMapName currentdict /CMap defineresource pop\nend\nend\n'
+)
+TO_UNICODE_BLOCK_SIZE = 100
+
+
+def to_unicode_cmap(used):
+    mapping = sorted(used.items())
+    blocks = [mapping[index:index + TO_UNICODE_BLOCK_SIZE]
+              for index in range(0, len(mapping), TO_UNICODE_BLOCK_SIZE)]
+    cmap = [TO_UNICODE_HEADER]
+    for block in blocks:
+        cmap.append(f'{len(block)} beginbfchar\n')
+        cmap += [f'<{glyph_id:04X}> <{char.encode("utf-16-be").hex()}>\n'
+                 for glyph_id, char in block]
+        cmap.append('endbfchar\n')
+    cmap.append(TO_UNICODE_FOOTER)
+    return ''.join(cmap).encode()
+
+
+class PDFStream:
+    catalog_id = 1
+    pages_id = 2
+
+    def __init__(self, font):
+        self.font = font
+        self.used = {}
+        self.position = 0
+        self.offsets = {}
+        self.next_id = self.pages_id + 1
+
+    def chunk(self, data):
+        self.position += len(data)
+        return data
+
+    def object(self, object_id, body, stream=None):
+        self.offsets[object_id] = self.position
+        data = f'{object_id} 0 obj\n'.encode() + body
+        if stream is not None:
+            data += b'\nstream\n' + stream + b'\nendstream'
+        return self.chunk(data + b'\nendobj\n')
+
+    def stream_object(self, object_id, stream, entries=''):
+        compressed = zlib.compress(stream)
+        return self.object(object_id, (
+            f'<< /Length {len(compressed)} /Filter /FlateDecode '
+            f'{entries}>>'
+        ).encode(), compressed)
+
+    def reserve(self):
+        object_id = self.next_id
+        self.next_id += 1
+        return object_id
+
+    def render(self, lines):
+        yield self.chunk(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        yield self.object(
+            self.catalog_id,
+            f'<< /Type /Catalog /Pages {self.pages_id} 0 R >>'.encode())
+        font_id = self.reserve()
+        kids = []
+        page_width, page_height = PDF_PAGE_SIZE
+        for content in render_pdf_pages(lines, self.font, self.used):
+            content_id, page_id = self.reserve(), self.reserve()
+            yield self.stream_object(content_id, content)
+            yield self.object(page_id, (
+                f'<< /Type /Page /Parent {self.pages_id} 0 R '
+                f'/MediaBox [0 0 {page_width} {page_height}] '
+                f'/Resources << /Font << /F1 {font_id} 0 R >> >> '
+                f'/Contents {content_id} 0 R >>'
+            ).encode())
+            kids.append(f'{page_id} 0 R')
+        yield self.object(self.pages_id, (
+            f'<< /Type /Pages /Kids [{" ".join(kids)}] '
+            f'/Count {len(kids)} >>'
+        ).encode())
+        yield from self.render_font(font_id)
+        xref_position = self.position
+        xref = [f'xref\n0 {self.next_id}\n', '0000000000 65535 f \n']
+        xref += [f'{self.offsets[object_id]:010d} 00000 n \n'
+                 for object_id in range(1, self.next_id)]
+        yield self.chunk(''.join(xref).encode())
+        yield self.chunk((
+            f'trailer\n<< /Size {self.next_id} '
+            f'/Root {self.catalog_id} 0 R >>\n'
+            f'startxref\n{xref_position}\n%%EOF\n'
+        ).encode())
+
+    def render_font(self, font_id):
+        font = self.font
+        glyph_ids = sorted({0, *self.used})
+        cid_font_id, descriptor_id, file_id, to_unicode_id = (
+            self.reserve(), self.reserve(), self.reserve(), self.reserve())
+        checksum = zlib.crc32(' '.join(map(str, glyph_ids)).encode())
+        tag = ''.join(chr(ord('A') + checksum // 26 ** index % 26)
+                      for index in range(6))
+        name = f'{tag}+{font.name}'
+        widths = ' '.join(f'{glyph_id} [{font.widths[glyph_id]}]'
+                          for glyph_id in glyph_ids)
+        yield self.object(font_id, (
+            f'<< /Type /Font /Subtype /Type0 /BaseFont /{name} '
+            f'/Encoding /Identity-H /DescendantFonts [{cid_font_id} 0 R] '
+            f'/ToUnicode {to_unicode_id} 0 R >>'
+        ).encode())
+        yield self.object(cid_font_id, (
+            f'<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{name} '
+            f'/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) '
+            f'/Supplement 0 >> /FontDescriptor {descriptor_id} 0 R '
+            f'/CIDToGIDMap /Identity /W [{widths}] >>'
+        ).encode())
+        yield self.object(descriptor_id, (
+            f'<< /Type /FontDescriptor /FontName /{name} /Flags 32 '
+            f'/FontBBox [{" ".join(map(str, font.bbox))}] /ItalicAngle 0 '
+            f'/Ascent {font.ascent} /Descent {font.descent} '
+            f'/CapHeight {font.cap_height} /StemV 80 '
+            f'/FontFile2 {file_id} 0 R >>'
+        ).encode())
+        data = font.subset(glyph_ids)
+        yield self.stream_object(file_id, data, f'/Length1 {len(data)} ')
+        yield self.stream_object(to_unicode_id, to_unicode_cmap(self.used))
+
+
+def render_pdf(rows):
+    lines = (line.rstrip('\n') for line in render_txt(rows))
+    return PDFStream(load_pdf_font(settings.SHOPPING_LIST_FONT)).render(
+        lines)
+
+
+SHOPPING_LIST_EXPORTS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
+
+
+def available_exports():
+    if pdf_font_available():
+        return SHOPPING_LIST_EXPORTS
+    return {name: export for name, export in SHOPPING_LIST_EXPORTS.items()
+            if name != 'pdf'}
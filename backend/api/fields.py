@@ -0,0 +1,75 @@
+from collections.abc import Mapping
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.resolved = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        if isinstance(data, bool):
+            raise TypeError
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            raise ValueError
+
+    def resolve(self, values):
+        pks = set()
+        for value in values:
+            try:
+                pks.add(self.to_pk(value))
+            except (TypeError, ValueError):
+                continue
+        self.resolved = self.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        if self.resolved is None:
+            return super().to_internal_value(data)
+        try:
+            pk = self.to_pk(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.resolved:
+            self.fail('does_not_exist', pk_value=data)
+        return self.resolved[pk]
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        self.child_relation.resolve(data)
+        values, errors = [], []
+        for item in data:
+            try:
+                values.append(self.child_relation.to_internal_value(item))
+            except serializers.ValidationError as exc:
+                errors.extend(exc.detail)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return values
+
+
+class BulkResolveListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            for field in self.child.fields.values():
+                if isinstance(field, BulkPrimaryKeyRelatedField):
+                    field.resolve(item.get(field.field_name) for item in data
+                                  if isinstance(item, Mapping))
+        return super().to_internal_value(data)
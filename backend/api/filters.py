@@ -1,16 +1,18 @@
 from django_filters import rest_framework
 
-from recieps.models import Ingredient, Recipe, Tag
+from api.search import search_recipes
+from recieps.models import Recipe, Tag
+from recieps.tags import has_all_tags, has_any_tags, tags_mask
 
 
-class IngredientSearch(rest_framework.FilterSet):
-    name = rest_framework.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith')
-
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+class TagMaskFilter(rest_framework.ModelMultipleChoiceFilter):
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        mask = tags_mask(value)
+        if self.conjoined:
+            return qs.filter(has_all_tags(mask))
+        return qs.filter(has_any_tags(mask))
 
 
 class RecipeFilter(rest_framework.FilterSet):
@@ -19,22 +21,31 @@ class RecipeFilter(rest_framework.FilterSet):
         method='is_recipe_in_favorites_filter')
     is_in_shopping_cart = rest_framework.BooleanFilter(
         method='is_recipe_in_shoppingcart_filter')
-    tags = rest_framework.ModelMultipleChoiceFilter(
+    tags = TagMaskFilter(
         queryset=Tag.objects.all(),
-        field_name='tags__slug',
+        field_name='tags_mask',
         to_field_name='slug')
+    all_tags = TagMaskFilter(
+        queryset=Tag.objects.all(),
+        field_name='tags_mask',
+        to_field_name='slug',
+        conjoined=True)
+    search = rest_framework.CharFilter(method='search_filter')
 
     def is_recipe_in_favorites_filter(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(favorites__user_id=self.request.user.id)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def is_recipe_in_shoppingcart_filter(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(
-                shoppinglist__user_id=self.request.user.id)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
+    def search_filter(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'all_tags', 'author', 'is_favorited',
+                  'is_in_shopping_cart', 'search')
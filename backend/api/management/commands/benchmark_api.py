@@ -0,0 +1,282 @@
+import base64
+import io
+import json
+import math
+import platform
+import subprocess
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from recieps.management.commands.generate_load_data import LOAD_PASSWORD
+from recieps.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+DEFAULT_ITERATIONS = 30
+DEFAULT_THRESHOLD = 20
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(samples, value):
+    ordered = sorted(samples)
+    rank = max(math.ceil(value / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def test_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (600, 400), '#E8A33D').save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks every API route through the Django test client and '
+            'reports latency percentiles, queries and bytes per request as '
+            'JSON. Write routes are exercised in add/remove pairs, so run it '
+            'against a database filled by generate_load_data, not '
+            'production.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int,
+                            default=DEFAULT_ITERATIONS)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--output', help='Write the JSON report here')
+        parser.add_argument('--compare', help='Baseline JSON report')
+        parser.add_argument('--threshold', type=float,
+                            default=DEFAULT_THRESHOLD,
+                            help='Allowed p95 regression, percent')
+
+    def handle(self, *args, **options):
+        fixtures = self.get_fixtures()
+        with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False):
+            results = {
+                name: self.measure(fixtures, scenario, options)
+                for name, scenario in self.get_scenarios(fixtures)
+            }
+        report = {'meta': self.get_meta(options), 'endpoints': results}
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            self.compare(report, options['compare'], options['threshold'])
+
+    def get_fixtures(self):
+        user = User.objects.annotate(
+            carts=Count('shoppinglist')
+        ).filter(carts__gt=0, subscriber__isnull=False).order_by(
+            '-carts').first() or User.objects.first()
+        recipe = Recipe.objects.exclude(author=user).exclude(
+            favorites__user=user).exclude(shoppinglist__user=user).exclude(
+            author__author__user=user).first()
+        author = recipe and recipe.author
+        if user is None or recipe is None or not Ingredient.objects.exists():
+            raise CommandError('Database is empty, run generate_load_data')
+        client = Client(HTTP_AUTHORIZATION=(
+            f'Token {Token.objects.get_or_create(user=user)[0].key}'))
+        return {
+            'user': user,
+            'author': author,
+            'recipe': recipe,
+            'tag': Tag.objects.first(),
+            'ingredient': Ingredient.objects.first(),
+            'client': client,
+            'anonymous': Client(),
+            'image': test_image(),
+        }
+
+    def get_scenarios(self, fixtures):
+        recipe = fixtures['recipe'].id
+        author = fixtures['author'].id
+        tag = fixtures['tag']
+        ingredient = fixtures['ingredient']
+        recipe_data = {
+            'name': 'Benchmark', 'text': 'benchmark', 'cooking_time': 10,
+            'image': fixtures['image'],
+            'tags': [tag.id] if tag else [],
+            'ingredients': [{'id': ingredient.id, 'amount': 10}],
+        }
+        pair = self.request_pair
+        return (
+            ('tag-list', self.get('anonymous', '/api/tags/')),
+            ('tag-detail', self.get('anonymous',
+                                    f'/api/tags/{tag.id if tag else 0}/')),
+            ('ingredient-list', self.get('anonymous', '/api/ingredients/')),
+            ('ingredient-list-search',
+             self.get('anonymous', '/api/ingredients/?name=са')),
+            ('ingredient-detail',
+             self.get('anonymous', f'/api/ingredients/{ingredient.id}/')),
+            ('recipe-list-anonymous', self.get('anonymous', '/api/recipes/')),
+            ('recipe-list', self.get('client', '/api/recipes/')),
+            ('recipe-list-page-10', self.get('client',
+                                             '/api/recipes/?page=10')),
+            ('recipe-list-cursor',
+             self.get('client', '/api/recipes/?cursor=')),
+            ('recipe-list-tags', self.get(
+                'client', f'/api/recipes/?tags={tag.slug if tag else ""}')),
+            ('recipe-list-author',
+             self.get('client', f'/api/recipes/?author={author}')),
+            ('recipe-list-favorited',
+             self.get('client', '/api/recipes/?is_favorited=1')),
+            ('recipe-list-in-cart',
+             self.get('client', '/api/recipes/?is_in_shopping_cart=1')),
+            ('recipe-list-search',
+             self.get('client', '/api/recipes/?search=суп')),
+            ('recipe-detail', self.get('client', f'/api/recipes/{recipe}/')),
+            ('recipe-create-delete', self.create_delete(recipe_data)),
+            ('recipe-favorite',
+             pair(f'/api/recipes/{recipe}/favorite/')),
+            ('recipe-shopping-cart',
+             pair(f'/api/recipes/{recipe}/shopping_cart/')),
+            ('recipe-download-shopping-cart',
+             self.get('client', '/api/recipes/download_shopping_cart/')),
+            ('recipe-download-shopping-cart-csv',
+             self.get('client',
+                      '/api/recipes/download_shopping_cart/?format=csv')),
+            ('recipe-download-shopping-cart-pdf',
+             self.get('client',
+                      '/api/recipes/download_shopping_cart/?format=pdf')),
+            ('users-list', self.get('client', '/api/users/')),
+            ('users-detail', self.get('client', f'/api/users/{author}/')),
+            ('users-me', self.get('client', '/api/users/me/')),
+            ('users-subscriptions',
+             self.get('client', '/api/users/subscriptions/?recipes_limit=3')),
+            ('users-subscribe',
+             pair(f'/api/users/{author}/subscribe/')),
+            ('login-logout', self.login_logout(fixtures['user'])),
+        )
+
+    @staticmethod
+    def get(client, url):
+        def scenario(fixtures):
+            return [fixtures[client].get(url)]
+        return scenario
+
+    @staticmethod
+    def request_pair(url):
+        def scenario(fixtures):
+            client = fixtures['client']
+            return [client.post(url), client.delete(url)]
+        return scenario
+
+    @staticmethod
+    def create_delete(data):
+        def scenario(fixtures):
+            client = fixtures['client']
+            created = client.post('/api/recipes/', data,
+                                  content_type='application/json')
+            if created.status_code != 201:
+                return [created]
+            recipe = created.json()['id']
+            return [created,
+                    client.patch(f'/api/recipes/{recipe}/', data,
+                                 content_type='application/json'),
+                    client.delete(f'/api/recipes/{recipe}/')]
+        return scenario
+
+    @staticmethod
+    def login_logout(user):
+        def scenario(fixtures):
+            client = fixtures['anonymous']
+            login = client.post('/api/auth/token/login/',
+                                {'email': user.email,
+                                 'password': LOAD_PASSWORD})
+            if login.status_code != 200:
+                return [login]
+            logout = client.post(
+                '/api/auth/token/logout/',
+                HTTP_AUTHORIZATION=f'Token {login.json()["auth_token"]}')
+            return [login, logout]
+        return scenario
+
+    def measure(self, fixtures, scenario, options):
+        for _ in range(options['warmup']):
+            self.run(fixtures, scenario)
+        timings, queries, sizes, statuses = [], [], [], set()
+        for _ in range(options['iterations']):
+            elapsed, query_count, size, codes = self.run(fixtures, scenario)
+            timings.append(elapsed)
+            queries.append(query_count)
+            sizes.append(size)
+            statuses.update(codes)
+        result = {
+            f'p{value}_ms': round(percentile(timings, value), 3)
+            for value in PERCENTILES
+        }
+        result.update({
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries': max(queries),
+            'bytes': max(sizes),
+            'status': sorted(statuses),
+        })
+        return result
+
+    @staticmethod
+    def run(fixtures, scenario):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            responses = scenario(fixtures)
+            size = 0
+            for response in responses:
+                if response.streaming:
+                    size += sum(len(chunk)
+                                for chunk in response.streaming_content)
+                else:
+                    size += len(response.content)
+            elapsed = (time.perf_counter() - start) * 1000
+        return (elapsed, len(context.captured_queries), size,
+                [response.status_code for response in responses])
+
+    @staticmethod
+    def get_meta(options):
+        try:
+            commit = subprocess.run(
+                ('git', 'rev-parse', '--short', 'HEAD'),
+                capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'created_at': timezone.now().isoformat(),
+            'iterations': options['iterations'],
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'recipes': Recipe.objects.count(),
+            'users': User.objects.count(),
+        }
+
+    def compare(self, report, baseline_path, threshold):
+        with open(baseline_path, encoding='utf-8') as file:
+            baseline = json.load(file)['endpoints']
+        regressions = 0
+        for name, result in report['endpoints'].items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            change = ((result['p95_ms'] - previous['p95_ms'])
+                      / previous['p95_ms'] * 100 if previous['p95_ms']
+                      else 0)
+            queries = result['queries'] - previous['queries']
+            regressed = change > threshold or queries > 0
+            regressions += regressed
+            style = self.style.ERROR if regressed else self.style.SUCCESS
+            self.stderr.write(style(
+                f'{name}: p95 {previous["p95_ms"]} -> {result["p95_ms"]} ms '
+                f'({change:+.1f}%), queries {previous["queries"]} -> '
+                f'{result["queries"]}'))
+        if regressions:
+            raise CommandError(f'{regressions} endpoints regressed')
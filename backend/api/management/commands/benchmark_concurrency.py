@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.benchmark_api import PERCENTILES, percentile
+from recieps.models import Recipe
+
+User = get_user_model()
+
+DEFAULT_CONCURRENCY = '1,10,50'
+DEFAULT_DURATION = 10
+DEFAULT_WORKERS = 2
+SERVER_START_TIMEOUT = 30
+SLOW_CLIENT_INTERVAL = 0.5
+RSS_SAMPLE_INTERVAL = 0.2
+SERVERS = {
+    'wsgi': ('foodgram_backend.wsgi:application',),
+    'asgi': ('foodgram_backend.asgi:application',
+             '--worker-class', 'uvicorn.workers.UvicornWorker'),
+}
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/{recipe}/',
+    '/api/tags/',
+    '/api/ingredients/?name=а',
+    '/api/users/subscriptions/?recipes_limit=3',
+    '/api/users/me/',
+)
+
+
+def process_tree(root):
+    parents = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as file:
+                stat = file.read()
+        except OSError:
+            continue
+        parents[int(name)] = int(stat.rsplit(')', 1)[1].split()[1])
+    tree = [root]
+    for pid in tree:
+        tree.extend(child for child, parent in parents.items()
+                    if parent == pid)
+    return tree
+
+
+def tree_rss_kb(root):
+    total = 0
+    for pid in process_tree(root):
+        try:
+            with open(f'/proc/{pid}/status') as file:
+                for line in file:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total
+
+
+class Command(BaseCommand):
+    help = ('Starts gunicorn with sync WSGI workers and with uvicorn ASGI '
+            'workers on the current database and compares throughput, '
+            'latency and server memory per in-flight request for the read '
+            'endpoints. Slow clients that trickle request headers can be '
+            'added to show how many workers they hold. Memory is read from '
+            '/proc, so it is reported on Linux only.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default=DEFAULT_CONCURRENCY,
+                            help='Comma separated numbers of parallel '
+                                 'clients')
+        parser.add_argument('--duration', type=float,
+                            default=DEFAULT_DURATION,
+                            help='Seconds per concurrency level')
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+        parser.add_argument('--slow-clients', type=int, default=0)
+        parser.add_argument('--servers', default=','.join(SERVERS))
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Request path, may be repeated')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--output', help='Write the JSON report here')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level)
+                      for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be a list of integers')
+        servers = options['servers'].split(',')
+        unknown = set(servers) - set(SERVERS)
+        if unknown:
+            raise CommandError(f'Unknown servers: {", ".join(unknown)}')
+        user = User.objects.first()
+        recipe = Recipe.objects.first()
+        if user is None or recipe is None:
+            raise CommandError('Database is empty, run generate_load_data')
+        token = Token.objects.get_or_create(user=user)[0].key
+        paths = [quote(path.format(recipe=recipe.id), safe='/?=&%')
+                 for path in options['paths'] or DEFAULT_PATHS]
+        results = {}
+        for server in servers:
+            self.stderr.write(f'Starting {server} server')
+            process = self.start_server(server, options)
+            try:
+                results[server] = {
+                    str(level): asyncio.run(self.measure(
+                        process.pid, paths, token, level, options))
+                    for level in levels
+                }
+            finally:
+                process.terminate()
+                process.wait()
+        report = {'meta': self.get_meta(options, paths),
+                  'servers': results}
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def start_server(self, server, options):
+        environment = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=os.environ['DJANGO_SETTINGS_MODULE'],
+            ASYNC_READ_VIEWS=str(server == 'asgi'),
+            ALLOWED_HOSTS='127.0.0.1',
+            DEBUG='False',
+        )
+        process = subprocess.Popen(
+            (sys.executable, '-m', 'gunicorn', *SERVERS[server],
+             '--workers', str(options['workers']),
+             '--bind', f'127.0.0.1:{options["port"]}',
+             '--log-level', 'warning'),
+            cwd=settings.BASE_DIR, env=environment)
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'{server} server exited on start')
+            try:
+                socket.create_connection(('127.0.0.1', options['port']),
+                                         timeout=1).close()
+                return process
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f'{server} server did not start in time')
+
+    async def measure(self, pid, paths, token, level, options):
+        port = options['port']
+        for path in paths:
+            await self.request(port, path, token)
+        idle_rss = tree_rss_kb(pid)
+        slow_clients = [
+            asyncio.create_task(self.slow_client(port))
+            for _ in range(options['slow_clients'])
+        ]
+        deadline = time.monotonic() + options['duration']
+        samples = []
+        peak_rss = [idle_rss]
+
+        async def client(number):
+            index = number
+            while time.monotonic() < deadline:
+                path = paths[index % len(paths)]
+                index += 1
+                samples.append(await self.request(port, path, token))
+
+        async def sample_rss():
+            while time.monotonic() < deadline:
+                peak_rss.append(tree_rss_kb(pid))
+                await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+        await asyncio.gather(sample_rss(),
+                             *(client(number) for number in range(level)))
+        for task in slow_clients:
+            task.cancel()
+        await asyncio.gather(*slow_clients, return_exceptions=True)
+        timings = [elapsed for elapsed, status in samples if status == 200]
+        result = {
+            'requests': len(samples),
+            'errors': len(samples) - len(timings),
+            'rps': round(len(timings) / options['duration'], 1),
+        }
+        if timings:
+            result.update({
+                f'p{value}_ms': round(percentile(timings, value), 3)
+                for value in PERCENTILES
+            })
+        if idle_rss:
+            result.update({
+                'idle_rss_kb': idle_rss,
+                'peak_rss_kb': max(peak_rss),
+                'rss_per_in_flight_kb': round(
+                    (max(peak_rss) - idle_rss) / level, 1),
+            })
+        self.stderr.write(f'{level} clients: {result}')
+        return result
+
+    @staticmethod
+    async def request(port, path, token):
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write((
+                f'GET {path} HTTP/1.1\r\n'
+                f'Host: 127.0.0.1\r\n'
+                f'Authorization: Token {token}\r\n'
+                f'Connection: close\r\n\r\n'
+            ).encode())
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            status = int(response.split(b' ', 2)[1])
+        except (OSError, IndexError, ValueError):
+            status = None
+        return (time.perf_counter() - start) * 1000, status
+
+    @staticmethod
+    async def slow_client(port):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            for byte in b'GET /api/recipes/ HTTP/1.1\r\nHost: 127.0.0.1\r\n':
+                writer.write(bytes((byte,)))
+                await writer.drain()
+                await asyncio.sleep(SLOW_CLIENT_INTERVAL)
+        finally:
+            writer.close()
+
+    @staticmethod
+    def get_meta(options, paths):
+        return {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'duration': options['duration'],
+            'workers': options['workers'],
+            'slow_clients': options['slow_clients'],
+            'paths': paths,
+            'recipes': Recipe.objects.count(),
+        }
@@ -0,0 +1,127 @@
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from api.constants import PAGE_SIZE
+from api.management.commands.benchmark_api import PERCENTILES, percentile
+from api.search import PantryIndex
+from recieps.models import Recipe, RecipeIngredient
+
+DEFAULT_QUERIES = 200
+DEFAULT_PANTRY_SIZE = 10
+
+
+def pantry_sql(ingredient_ids, page_size):
+    matches = RecipeIngredient.objects.values('recipe_id').annotate(
+        matched=Count('id', filter=Q(ingredient__in=ingredient_ids)),
+        total=Count('id')
+    ).filter(matched__gt=0)
+    ranked = matches.annotate(
+        coverage=Cast('matched', FloatField()) / F('total'),
+        missing=F('total') - F('matched')
+    ).order_by('-coverage', 'missing', '-recipe_id')
+    return (matches.count(),
+            [(row['recipe_id'], row['missing'])
+             for row in ranked[:page_size]])
+
+
+def index_size_kb(index):
+    size = sys.getsizeof(index.postings) + sys.getsizeof(index.recipes)
+    size += sum(sys.getsizeof(recipe_ids)
+                for recipe_ids in index.postings.values())
+    size += sum(sys.getsizeof(ingredients)
+                for ingredients in index.recipes.values())
+    return round(size / 1024)
+
+
+def timings_summary(timings):
+    return {f'p{value}_ms': round(percentile(timings, value), 3)
+            for value in PERCENTILES}
+
+
+class Command(BaseCommand):
+    help = ('Compares the in-process pantry index with the GROUP BY query '
+            'over RecipeIngredient on the current database: build time, '
+            'memory and latency of the first page for random pantries '
+            'weighted by ingredient popularity. Fill the database with '
+            'generate_load_data --recipes 100000 first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=DEFAULT_QUERIES)
+        parser.add_argument('--pantry-size', type=int,
+                            default=DEFAULT_PANTRY_SIZE)
+        parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skip-sql', action='store_true')
+        parser.add_argument('--output', help='Write the JSON report here')
+
+    def handle(self, *args, **options):
+        index = PantryIndex()
+        start = time.perf_counter()
+        index.build()
+        build_ms = (time.perf_counter() - start) * 1000
+        if not index.recipes:
+            raise CommandError('Database is empty, run generate_load_data')
+        tracemalloc.start()
+        PantryIndex().build()
+        traced_kb = round(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+        rng = random.Random(options['seed'])
+        ingredients = list(index.postings)
+        weights = [len(index.postings[ingredient])
+                   for ingredient in ingredients]
+        pantries = [
+            list({rng.choices(ingredients, weights)[0]
+                  for _ in range(options['pantry_size'])})
+            for _ in range(options['queries'])
+        ]
+        index_timings, sql_timings, mismatches = [], [], 0
+        for pantry in pantries:
+            start = time.perf_counter()
+            ranked = index.search(pantry)
+            page = ranked[:options['page_size']]
+            index_timings.append((time.perf_counter() - start) * 1000)
+            if options['skip_sql']:
+                continue
+            start = time.perf_counter()
+            count, sql_page = pantry_sql(pantry, options['page_size'])
+            sql_timings.append((time.perf_counter() - start) * 1000)
+            if count != len(ranked) or sql_page != page:
+                mismatches += 1
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'recipes': Recipe.objects.count(),
+                'recipe_ingredients': sum(weights),
+                'ingredients': len(ingredients),
+                'queries': options['queries'],
+                'pantry_size': options['pantry_size'],
+                'page_size': options['page_size'],
+            },
+            'index': {
+                'build_ms': round(build_ms, 1),
+                'size_kb': index_size_kb(index),
+                'build_peak_kb': traced_kb,
+                **timings_summary(index_timings),
+            },
+        }
+        if sql_timings:
+            report['sql'] = timings_summary(sql_timings)
+            report['mismatches'] = mismatches
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+        if mismatches:
+            raise CommandError(f'{mismatches} pantries ranked differently')
@@ -0,0 +1,117 @@
+import json
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.management.commands.benchmark_api import (
+    Command as BenchmarkCommand)
+from api.search import ingredient_index, pantry_index
+
+EXPLAINED_STATEMENTS = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+CURSOR_DECLARATION = re.compile(r'^DECLARE .+? CURSOR .*?FOR ', re.DOTALL)
+FAILING_NODES = ('Seq Scan', 'Sort')
+ALLOWED_NODES = {
+    'recipe-list-search': {'Sort'},
+}
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def describe(node):
+    if node['Node Type'] == 'Sort':
+        return f'Sort by {", ".join(node["Sort Key"])}'
+    return f'{node["Node Type"]} on {node["Relation Name"]}'
+
+
+class Command(BaseCommand):
+    help = ('Runs every API route through the Django test client, explains '
+            'each query it sends and fails if a plan still contains a '
+            'sequential scan or a sort when the planner is told to avoid '
+            'them, which means no index serves that query shape. The '
+            'in-process search indexes are built before the check, their '
+            'full reads are not per-request queries. '
+            'PostgreSQL only, run it against a database filled by '
+            'generate_load_data, not production.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Print the offending plans as JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('EXPLAIN check needs PostgreSQL, current '
+                               f'database is {connection.vendor}')
+        benchmark = BenchmarkCommand()
+        fixtures = benchmark.get_fixtures()
+        ingredient_index.get()
+        pantry_index.get()
+        scenarios = (
+            ('recipe-list-all-tags', benchmark.get(
+                'client', f'/api/recipes/?all_tags={fixtures["tag"].slug}')),
+            ('recipe-feed', benchmark.get('client', '/api/recipes/feed/')),
+            ('recipe-similar', benchmark.get(
+                'client', f'/api/recipes/{fixtures["recipe"].id}/similar/')),
+            ('recipe-pantry', benchmark.get(
+                'client',
+                f'/api/recipes/pantry/?ingredients={fixtures["ingredient"].id}'
+            )),
+        ) + benchmark.get_scenarios(fixtures)
+        failures = 0
+        with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False):
+            for name, scenario in scenarios:
+                with CaptureQueriesContext(connection) as context:
+                    responses = scenario(fixtures)
+                    for response in responses:
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                errors = [response.status_code for response in responses
+                          if response.status_code >= 400]
+                if errors:
+                    failures += 1
+                    self.stderr.write(self.style.ERROR(
+                        f'{name}: responded with {errors}'))
+                queries = {
+                    sql for sql in (
+                        CURSOR_DECLARATION.sub('', query['sql'].lstrip())
+                        for query in context.captured_queries)
+                    if sql.upper().startswith(EXPLAINED_STATEMENTS)
+                }
+                offenders = []
+                for sql in queries:
+                    plan = self.explain(sql)
+                    nodes = [
+                        describe(node) for node in plan_nodes(plan)
+                        if node['Node Type'] in FAILING_NODES
+                        and node['Node Type'] not in ALLOWED_NODES.get(
+                            name, ())
+                    ]
+                    if nodes:
+                        offenders.append((sql, nodes, plan))
+                if not offenders:
+                    self.stdout.write(f'{name}: {len(queries)} queries')
+                    continue
+                failures += len(offenders)
+                for sql, nodes, plan in offenders:
+                    self.stderr.write(self.style.ERROR(
+                        f'{name}: {"; ".join(nodes)}\n  {sql}'))
+                    if options['verbose_plans']:
+                        self.stderr.write(json.dumps(plan, indent=2))
+        if failures:
+            raise CommandError(f'{failures} queries are not served by an '
+                               f'index')
+        self.stdout.write(self.style.SUCCESS('All queries use indexes'))
+
+    @staticmethod
+    def explain(sql):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            return cursor.fetchone()[0][0]['Plan']
@@ -0,0 +1,104 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from recieps.cart import cart_totals
+from recieps.counters import counter_drift
+from recieps.models import Recipe, ShoppingCartIngredient
+
+User = get_user_model()
+
+DEFAULT_THREADS = 8
+DEFAULT_ROUNDS = 5
+
+
+class Command(BaseCommand):
+    help = ('Sends the same favorite, shopping cart and subscribe request '
+            'from parallel threads and checks that exactly one of them '
+            'succeeds, the others get 400, and counters and cart totals '
+            'stay consistent. Consistency is only checked, never repaired. '
+            'The command removes the rows it creates, but run it against a '
+            'database filled by generate_load_data, not production. The '
+            'same races are covered by the api tests on PostgreSQL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=DEFAULT_THREADS)
+        parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(is_active=True).first()
+        recipe = Recipe.objects.exclude(author=user).exclude(
+            favorites__user=user).exclude(shoppinglist__user=user).first()
+        if user is None or recipe is None:
+            raise CommandError('Database is empty, run generate_load_data')
+        author = recipe.author
+        if author.author.filter(user=user).exists():
+            raise CommandError(f'{user} is already subscribed to {author}, '
+                               f'pick another database')
+        token = Token.objects.get_or_create(user=user)[0].key
+        scenarios = (
+            ('favorite', f'/api/recipes/{recipe.id}/favorite/', True),
+            ('shopping_cart', f'/api/recipes/{recipe.id}/shopping_cart/',
+             True),
+            ('subscribe', f'/api/users/{author.id}/subscribe/', True),
+            ('subscribe_self', f'/api/users/{user.id}/subscribe/', False),
+        )
+        failures = 0
+        with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False):
+            for name, url, succeeds in scenarios:
+                for number in range(options['rounds']):
+                    codes = self.hammer(url, token, options['threads'])
+                    expected = ([201] if succeeds else []) + [400] * (
+                        options['threads'] - succeeds)
+                    if sorted(codes) != expected:
+                        failures += 1
+                        self.stderr.write(self.style.ERROR(
+                            f'{name} round {number}: {sorted(codes)}'))
+                    if succeeds:
+                        Client(HTTP_AUTHORIZATION=f'Token {token}').delete(
+                            url)
+                self.stdout.write(f'{name}: {options["rounds"]} rounds done')
+        failures += self.check_consistency(user)
+        if failures:
+            raise CommandError(f'{failures} checks failed')
+        self.stdout.write(self.style.SUCCESS('No races detected'))
+
+    @staticmethod
+    def hammer(url, token, threads):
+        barrier = threading.Barrier(threads)
+        codes = []
+
+        def worker():
+            client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+            try:
+                barrier.wait()
+                codes.append(client.post(url).status_code)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return codes
+
+    def check_consistency(self, user):
+        failures = 0
+        for counter, drifted in counter_drift().items():
+            if drifted:
+                failures += 1
+                self.stderr.write(self.style.ERROR(
+                    f'{counter}: {drifted} rows have drifted'))
+        cart = set(ShoppingCartIngredient.objects.filter(
+            user=user).values_list('ingredient_id', 'amount'))
+        if cart != {(row['ingredient_id'], row['total'])
+                    for row in cart_totals([user])}:
+            failures += 1
+            self.stderr.write(self.style.ERROR(
+                f'Shopping cart of {user} has drifted'))
+        return failures
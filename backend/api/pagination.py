@@ -1,9 +1,169 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
-from api.constants import MAX_PAGE_SIZE, PAGE_SIZE
+from api.constants import (FEED_KEYSET_ORDERING, KEYSET_ORDERING,
+                           MAX_PAGE_SIZE, PAGE_SIZE)
 
 
-class CustomPaginator(PageNumberPagination):
+class PageNumberPaginator(PageNumberPagination):
     page_size = PAGE_SIZE
     page_size_query_param = 'limit'
     max_page_size = MAX_PAGE_SIZE
+
+
+class CustomPaginator(PageNumberPaginator):
+    cursor_query_param = 'cursor'
+    keyset_ordering = KEYSET_ORDERING
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        return self.keyset_page(
+            list(self.keyset_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if self.keyset:
+            return self.keyset_page([
+                obj async for obj
+                in self.keyset_queryset(queryset, request, view)
+            ])
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+        self.page.object_list = [obj async for obj
+                                 in self.page.object_list]
+        self.request = request
+        return list(self.page)
+
+    def keyset_queryset(self, queryset, request, view):
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering',
+                                self.keyset_ordering)
+        self.page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request)
+        if self.position is not None:
+            self.position = self.position_values(queryset, self.position)
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering,
+                                                          self.position))
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def keyset_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+        self.has_next = has_more or self.reverse
+        self.has_previous = self.position is not None and (
+            has_more or not self.reverse)
+        self.results = results
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_cursor_link(self.has_next, -1, False),
+            'previous': self.get_cursor_link(self.has_previous, 0, True),
+            'results': data,
+        })
+
+    def get_cursor_link(self, exists, index, reverse):
+        if not exists or not self.results:
+            return None
+        obj = self.results[index]
+        position = [str(getattr(obj, field.lstrip('-')))
+                    for field in self.ordering]
+        cursor = base64.urlsafe_b64encode(
+            json.dumps({'p': position, 'r': reverse}).encode()
+        ).decode()
+        return replace_query_param(self.request.build_absolute_uri(),
+                                   self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if (not isinstance(position, list)
+                or len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def position_values(self, queryset, position):
+        values = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            try:
+                model_field = queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                model_field = queryset.query.annotations[name].output_field
+            if model_field.is_relation:
+                model_field = model_field.target_field
+            try:
+                value = model_field.to_python(value)
+                if value is None:
+                    raise ValidationError('')
+                model_field.run_validators(value)
+            except (TypeError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+            values.append(value)
+        return values
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def keyset_filter(ordering, position):
+        keyset = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            keyset |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return keyset
+
+
+class FeedPaginator(CustomPaginator):
+    keyset_ordering = FEED_KEYSET_ORDERING
+
+    def paginate_querysets(self, querysets, request, view=None):
+        self.keyset = True
+        fields = [field.lstrip('-') for field in self.keyset_ordering]
+        entries = {}
+        for queryset in querysets:
+            for entry in self.keyset_queryset(
+                    queryset.values_list(*fields, named=True), request, view):
+                entries[entry.recipe_id] = entry
+        descending = self.ordering[0].startswith('-') != self.reverse
+        return self.keyset_page(sorted(
+            entries.values(), reverse=descending
+        )[:self.page_size + 1])
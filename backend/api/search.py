@@ -0,0 +1,266 @@
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from api.constants import PANTRY_INDEX_TTL, RECIPE_FTS_TABLE, SEARCH_CONFIGS
+from recieps.models import DataVersion, Ingredient, Recipe, RecipeIngredient
+from recieps.tasks import run_in_background
+
+
+class IngredientIndex:
+    version_name = 'ingredients'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = None
+        self.ingredients = None
+        self.version = None
+
+    def queryset(self):
+        return Ingredient.objects.only('id', 'name', 'measurement_unit')
+
+    def store(self, version, ingredients):
+        ingredients = sorted(
+            ingredients,
+            key=lambda ingredient: (ingredient.name.casefold(),
+                                    ingredient.measurement_unit)
+        )
+        keys = [ingredient.name.casefold() for ingredient in ingredients]
+        with self.lock:
+            self.keys = keys
+            self.ingredients = ingredients
+            self.version = version
+        return keys, ingredients
+
+    def cached(self, version):
+        with self.lock:
+            if self.keys is None or self.version != version:
+                return None
+            return self.keys, self.ingredients
+
+    def get(self):
+        version = DataVersion.get(self.version_name).version
+        return self.cached(version) or self.store(version,
+                                                  list(self.queryset()))
+
+    async def aget(self):
+        version = (await DataVersion.aget(self.version_name)).version
+        return self.cached(version) or self.store(
+            version, [ingredient async for ingredient in self.queryset()])
+
+    def search(self, query):
+        return self.match(*self.get(), query)
+
+    async def asearch(self, query):
+        return self.match(*await self.aget(), query)
+
+    @staticmethod
+    def match(keys, ingredients, query):
+        query = query.strip().casefold()
+        if not query:
+            return list(ingredients)
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        contains = sorted(
+            (key.find(query), len(key), index)
+            for index, key in enumerate(keys)
+            if (index < start or index >= end) and query in key
+        )
+        return ingredients[start:end] + [
+            ingredients[index] for _, _, index in contains
+        ]
+
+
+ingredient_index = IngredientIndex()
+
+
+class PantryIndex:
+    version_name = 'pantry'
+
+    def __init__(self, ttl=PANTRY_INDEX_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.postings = None
+        self.recipes = None
+        self.changes = None
+        self.version = None
+        self.built_at = 0
+
+    def build(self):
+        with self.build_lock:
+            with self.lock:
+                if self.changes is None:
+                    self.changes = {}
+            version = DataVersion.get(self.version_name).version
+            rows = RecipeIngredient.objects.values_list('recipe_id',
+                                                        'ingredient_id')
+            recipes = defaultdict(set)
+            for recipe_id, ingredient_id in rows.iterator():
+                recipes[recipe_id].add(ingredient_id)
+            recipes = {recipe_id: tuple(ingredients)
+                       for recipe_id, ingredients in recipes.items()}
+            postings = defaultdict(list)
+            for recipe_id in sorted(recipes):
+                for ingredient_id in recipes[recipe_id]:
+                    postings[ingredient_id].append(recipe_id)
+            postings = {ingredient_id: array('q', recipe_ids)
+                        for ingredient_id, recipe_ids in postings.items()}
+            with self.lock:
+                self.postings = postings
+                self.recipes = recipes
+                for recipe_id, ingredients in self.changes.items():
+                    self.apply(recipe_id, ingredients)
+                self.changes = None
+                self.version = version
+                self.built_at = time.monotonic()
+            return postings, recipes
+
+    def get(self):
+        version = DataVersion.get(self.version_name).version
+        with self.lock:
+            index = self.postings, self.recipes
+            expired = (self.postings is not None and self.changes is None
+                       and (self.version != version
+                            or time.monotonic() - self.built_at > self.ttl))
+            if expired:
+                self.changes = {}
+        if index[0] is None:
+            return self.build()
+        if expired:
+            run_in_background(self.build)
+        return index
+
+    def update(self, recipe_id, ingredient_ids):
+        ingredients = tuple(set(ingredient_ids))
+        with self.lock:
+            if self.changes is not None:
+                self.changes[recipe_id] = ingredients
+            if self.postings is not None:
+                self.apply(recipe_id, ingredients)
+
+    def remove(self, recipe_id):
+        self.update(recipe_id, ())
+
+    def apply(self, recipe_id, ingredients):
+        current = set(self.recipes.get(recipe_id, ()))
+        for ingredient_id in current - set(ingredients):
+            recipe_ids = self.postings[ingredient_id]
+            index = bisect_left(recipe_ids, recipe_id)
+            self.postings[ingredient_id] = (recipe_ids[:index]
+                                            + recipe_ids[index + 1:])
+        for ingredient_id in set(ingredients) - current:
+            recipe_ids = self.postings.get(ingredient_id, array('q'))
+            index = bisect_left(recipe_ids, recipe_id)
+            self.postings[ingredient_id] = (recipe_ids[:index]
+                                            + array('q', (recipe_id,))
+                                            + recipe_ids[index:])
+        if ingredients:
+            self.recipes[recipe_id] = ingredients
+        else:
+            self.recipes.pop(recipe_id, None)
+
+    def search(self, ingredient_ids):
+        postings, recipes = self.get()
+        matches = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matches.update(postings.get(ingredient_id, ()))
+        ranked = []
+        for recipe_id, matched in matches.items():
+            ingredients = recipes.get(recipe_id)
+            if ingredients:
+                ranked.append((-matched / len(ingredients),
+                               len(ingredients) - matched,
+                               -recipe_id))
+        ranked.sort()
+        return [(-recipe_id, missing) for _, missing, recipe_id in ranked]
+
+
+pantry_index = PantryIndex()
+
+
+def recipe_search_vector():
+    vector = None
+    for config in SEARCH_CONFIGS:
+        for field, weight in (('name', 'A'), ('text', 'B')):
+            part = SearchVector(field, config=config, weight=weight)
+            vector = part if vector is None else vector + part
+    return vector
+
+
+def update_recipe_search_index(recipe):
+    if connection.vendor == 'postgresql':
+        Recipe.objects.filter(pk=recipe.pk).update(
+            search_vector=recipe_search_vector())
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {RECIPE_FTS_TABLE} WHERE rowid = %s',
+                           [recipe.pk])
+            cursor.execute(
+                f'INSERT INTO {RECIPE_FTS_TABLE} (rowid, name, text) '
+                'VALUES (%s, %s, %s)',
+                [recipe.pk, recipe.name, recipe.text]
+            )
+
+
+def index_recipes(recipes):
+    if connection.vendor == 'postgresql':
+        Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes]).update(
+            search_vector=recipe_search_vector())
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {RECIPE_FTS_TABLE} (rowid, name, text) '
+                'VALUES (%s, %s, %s)',
+                [(recipe.pk, recipe.name, recipe.text) for recipe in recipes]
+            )
+
+
+def delete_recipe_search_index(recipe):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {RECIPE_FTS_TABLE} WHERE rowid = %s',
+                           [recipe.pk])
+
+
+def search_recipes(queryset, value):
+    terms = re.findall(r'\w+', value)
+    if not terms:
+        return queryset
+    if connection.vendor == 'postgresql':
+        query = None
+        for config in SEARCH_CONFIGS:
+            part = SearchQuery(value, config=config, search_type='websearch')
+            query = part if query is None else query | part
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-created_at')
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {RECIPE_FTS_TABLE} '
+            f'WHERE {RECIPE_FTS_TABLE} MATCH %s',
+            [match]
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({RECIPE_FTS_TABLE}, 10.0, 1.0) '
+            f'FROM {RECIPE_FTS_TABLE} '
+            f'WHERE {RECIPE_FTS_TABLE} MATCH %s '
+            f'AND rowid = {Recipe._meta.db_table}.id',
+            [match],
+            output_field=FloatField()
+        )).order_by('-search_rank', '-created_at')
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(text__icontains=term)
+    return queryset.filter(condition)
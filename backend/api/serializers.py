@@ -1,17 +1,75 @@
+from functools import partial
+
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
+from rest_framework.settings import api_settings
 
+from api.constants import MAX_BATCH_SIZE, MAX_PANTRY_SIZE, MAX_RECIPES_LIMIT
+from api.fields import BulkPrimaryKeyRelatedField, BulkResolveListSerializer
+from api.search import pantry_index
+from recieps.cart import change_recipe_in_carts
+from recieps.images import derivative_urls
 from recieps.models import (FavoriteRecipes, Ingredient, Recipe,
                             RecipeIngredient, ShoppingList, Tag)
+from recieps.similarity import refresh_similar_recipes
+from recieps.tags import tags_mask
+from recieps.tasks import run_on_commit
 from users.models import Subscription
 
 User = get_user_model()
 
 
+def get_recipes_limit(request):
+    limit = request.query_params.get('recipes_limit') if request else None
+    if limit is None:
+        return MAX_RECIPES_LIMIT
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        raise serializers.ValidationError(
+            {'recipes_limit': 'Должно быть неотрицательным целым числом.'})
+    return min(limit, MAX_RECIPES_LIMIT)
+
+
+def violated_constraint(error, model):
+    name = getattr(getattr(error.__cause__, 'diag', None),
+                   'constraint_name', None)
+    if name:
+        return name
+    message = str(error)
+    for constraint in model._meta.constraints:
+        if constraint.name in message:
+            return constraint.name
+        columns = [f'{model._meta.db_table}.'
+                   f'{model._meta.get_field(field).column}'
+                   for field in getattr(constraint, 'fields', ())]
+        if columns and all(column in message for column in columns):
+            return constraint.name
+    return None
+
+
+class ConstraintMessagesMixin:
+    constraint_messages = {}
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError as error:
+            message = self.constraint_messages.get(
+                violated_constraint(error, self.Meta.model))
+            if message is None:
+                raise
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [message]})
+
+
 class UserInfoSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
@@ -25,6 +83,8 @@ class UserInfoSerializer(UserSerializer):
                   'is_subscribed',)
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and request.user.subscriber.filter(author=obj).exists())
@@ -63,6 +123,7 @@ class RecipeListSerializer(serializers.ModelSerializer):
                                              many=True,
                                              read_only=True)
     image = Base64ImageField(max_length=None, use_url=True)
+    images = serializers.SerializerMethodField()
     tags = TagSerializer(many=True, read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
@@ -74,6 +135,7 @@ class RecipeListSerializer(serializers.ModelSerializer):
                   'author',
                   'ingredients',
                   'image',
+                  'images',
                   'tags',
                   'is_favorited',
                   'is_in_shopping_cart',
@@ -81,7 +143,12 @@ class RecipeListSerializer(serializers.ModelSerializer):
                   'cooking_time',)
         read_only_fields = ('id', 'author',)
 
+    def get_images(self, obj):
+        return derivative_urls(obj, self.context.get('request'))
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and FavoriteRecipes.objects.filter(
@@ -89,6 +156,8 @@ class RecipeListSerializer(serializers.ModelSerializer):
                     recipe=obj).exists())
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
 
         return (request and request.user.is_authenticated
@@ -97,20 +166,27 @@ class RecipeListSerializer(serializers.ModelSerializer):
 
 
 class IngredientCreateRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all(),
-                                            source='ingredient')
+    id = BulkPrimaryKeyRelatedField(queryset=Ingredient.objects.all(),
+                                    source='ingredient')
 
     class Meta:
         model = RecipeIngredient
+        list_serializer_class = BulkResolveListSerializer
         fields = (
             'id',
             'amount',
         )
 
 
+class PantryRecipeSerializer(RecipeListSerializer):
+    missing_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + ('missing_count',)
+
+
 class RecipeCreateSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(many=True,
-                                              queryset=Tag.objects.all())
+    tags = BulkPrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
     image = Base64ImageField(allow_empty_file=False, allow_null=False)
     ingredients = IngredientCreateRecipeSerializer(many=True)
 
@@ -131,20 +207,22 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, data):
-        ingredients = data.get('ingredients')
-        if not ingredients:
-            raise serializers.ValidationError('Ингредиенты не выбраны')
-        ingredient_ids = [ingredient['ingredient'].id
-                          for ingredient in ingredients]
-        if len(ingredient_ids) != len(set(ingredient_ids)):
-            raise serializers.ValidationError('Ингредиенты в '
-                                              'рецепте повторяются.')
-
-        tags = data.get('tags')
-        if not tags:
-            raise serializers.ValidationError('Теги отсутствуют')
-        if len(tags) != len(set(tags)):
-            raise serializers.ValidationError('Теги повторя.тся')
+        if not self.partial or 'ingredients' in data:
+            ingredients = data.get('ingredients')
+            if not ingredients:
+                raise serializers.ValidationError('Ингредиенты не выбраны')
+            ingredient_ids = [ingredient['ingredient'].id
+                              for ingredient in ingredients]
+            if len(ingredient_ids) != len(set(ingredient_ids)):
+                raise serializers.ValidationError('Ингредиенты в '
+                                                  'рецепте повторяются.')
+
+        if not self.partial or 'tags' in data:
+            tags = data.get('tags')
+            if not tags:
+                raise serializers.ValidationError('Теги отсутствуют')
+            if len(tags) != len(set(tags)):
+                raise serializers.ValidationError('Теги повторя.тся')
         return data
 
     @transaction.atomic
@@ -153,19 +231,25 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags')
 
         author = self.context['request'].user
-        recipe = Recipe.objects.create(author=author, **validated_data)
+        recipe = Recipe.objects.create(author=author,
+                                       tags_mask=tags_mask(tags),
+                                       **validated_data)
         recipe.tags.set(tags)
+        ingredient_ids = [ingredient_data['ingredient'].id
+                          for ingredient_data in ingredients_data]
         self.create_ingredients(recipe, ingredients_data)
+        self.update_indexes(recipe, ingredient_ids)
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        instance.ingredients.clear()
-        instance.tags.clear()
-        self.create_ingredients(instance, ingredients_data)
-        instance.tags.set(tags)
+        ingredients_data = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        if ingredients_data is not None:
+            self.update_ingredients(instance, ingredients_data)
+        if tags is not None:
+            instance.tags.set(tags)
+            instance.tags_mask = tags_mask(tags)
         return super().update(instance, validated_data)
 
     def create_ingredients(self, recipe, ingredients):
@@ -181,40 +265,81 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
         RecipeIngredient.objects.bulk_create(create_ingredients)
 
+    def update_ingredients(self, recipe, ingredients):
+        new_amounts = {ingredient_data['ingredient'].id:
+                       ingredient_data['amount']
+                       for ingredient_data in ingredients}
+        current = {}
+        old_amounts = {}
+        deleted = []
+        for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe):
+            ingredient_id = recipe_ingredient.ingredient_id
+            old_amounts[ingredient_id] = (old_amounts.get(ingredient_id, 0)
+                                          + recipe_ingredient.amount)
+            if (ingredient_id in current
+                    or ingredient_id not in new_amounts):
+                deleted.append(recipe_ingredient.id)
+            else:
+                current[ingredient_id] = recipe_ingredient
+        changed = []
+        for ingredient_id, recipe_ingredient in current.items():
+            if recipe_ingredient.amount != new_amounts[ingredient_id]:
+                recipe_ingredient.amount = new_amounts[ingredient_id]
+                changed.append(recipe_ingredient)
+        if deleted:
+            RecipeIngredient.objects.filter(id__in=deleted).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amount)
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in current
+        )
+        change_recipe_in_carts(recipe, old_amounts, new_amounts)
+        if old_amounts.keys() != new_amounts.keys():
+            self.update_indexes(recipe, new_amounts)
+
+    @staticmethod
+    def update_indexes(recipe, ingredient_ids):
+        transaction.on_commit(partial(pantry_index.update, recipe.id,
+                                      list(ingredient_ids)))
+        run_on_commit(refresh_similar_recipes, recipe.id)
+
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], 'tags',
+            Prefetch('recipeingredient_set',
+                     queryset=RecipeIngredient.objects.select_related(
+                         'ingredient')))
         return RecipeListSerializer(instance, context={
             'request': self.context['request']
         }).data
 
 
 class MiniRecipeSerializer(serializers.ModelSerializer):
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image', 'name', 'cooking_time')
+        fields = ('id', 'image', 'images', 'name', 'cooking_time')
 
+    def get_images(self, obj):
+        return derivative_urls(obj, self.context.get('request'))
 
-class SubscribeSerializer(serializers.ModelSerializer):
+
+class SubscribeSerializer(ConstraintMessagesMixin,
+                          serializers.ModelSerializer):
+    constraint_messages = {
+        'unique_subscription': 'Вы уже подписаны на этого автора!',
+        'user_not_subscribe_self': 'Нельзя подписаться на себя.',
+    }
 
     class Meta:
         model = Subscription
         fields = ('user', 'author')
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Subscription.objects.all(),
-                fields=('user', 'author'),
-                message='Вы уже подписаны на этого автора!',
-            ),
-        ]
-
-    def validate(self, data):
-        author = data.get('author')
-        user = self.context.get('request').user
-
-        if user == author:
-            raise serializers.ValidationError('Нельзя подписаться на себя.')
-
-        return data
+        read_only_fields = ('user', 'author')
 
     def to_representation(self, instance):
         return UserSubscribesSerializer(
@@ -247,50 +372,64 @@ class UserSubscribesSerializer(UserInfoSerializer):
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        recipes = obj.recipes.all()
-        limit = request.query_params.get('recipes_limit')
-        if limit:
-            recipes = recipes[:int(limit)]
+        recipes = getattr(obj, 'recent_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.all()[:get_recipes_limit(request)]
         return MiniRecipeSerializer(
             recipes, context={'request': request}, many=True
         ).data
 
     def get_recipes_count(self, obj):
-
-        return obj.recipes.count()
+        return obj.recipes_count
 
 
-class FavRecipeCreateSerializer(serializers.ModelSerializer):
+class FavRecipeCreateSerializer(ConstraintMessagesMixin,
+                                serializers.ModelSerializer):
+    constraint_messages = {
+        'favoriterecipes_unique_user_recipe':
+            'Вы уже подписаны на этого автора!',
+    }
 
     class Meta:
         model = FavoriteRecipes
         fields = ('recipe', 'user')
-        validators = [
-            UniqueTogetherValidator(
-                queryset=FavoriteRecipes.objects.all(),
-                fields=('recipe', 'user'),
-                message='Вы уже подписаны на этого автора!',
-            ),
-        ]
+        read_only_fields = ('user',)
 
     def to_representation(self, instance):
         return MiniRecipeSerializer(
             instance.recipe).data
 
 
-class ShoppingListSerializer(serializers.ModelSerializer):
+class ShoppingListSerializer(ConstraintMessagesMixin,
+                             serializers.ModelSerializer):
+    constraint_messages = {
+        'shoppinglist_unique_user_recipe': 'Рецепт уже в корзине!',
+    }
 
     class Meta:
         model = ShoppingList
         fields = ('recipe', 'user')
-        validators = [
-            UniqueTogetherValidator(
-                queryset=ShoppingList.objects.all(),
-                fields=('recipe', 'user'),
-                message='Рецепт уже в корзине!',
-            ),
-        ]
+        read_only_fields = ('user',)
 
     def to_representation(self, instance):
         return MiniRecipeSerializer(
             instance.recipe).data
+
+
+class RecipeBatchSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
+class PantrySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_PANTRY_SIZE
+    )
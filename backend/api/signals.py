@@ -0,0 +1,148 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+from api.search import (delete_recipe_search_index, pantry_index,
+                        update_recipe_search_index)
+from recieps.cart import add_recipe_to_cart, remove_recipe_from_cart
+from recieps.counters import RECIPE_COUNTERS, shift_counter
+from recieps.feed import (add_author_to_feed, fan_out_recipe,
+                          remove_author_from_feed)
+from recieps.images import create_recipe_derivatives, delete_derivatives
+from recieps.models import (DataVersion, FavoriteRecipes, Ingredient, Recipe,
+                            ShoppingList, Tag)
+from recieps.tags import clear_tag_bit
+from recieps.tasks import run_on_commit
+from users.models import Subscription, User
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    DataVersion.bump('ingredients')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    DataVersion.bump('tags')
+
+
+@receiver(post_delete, sender=Tag)
+def clear_deleted_tag_bit(sender, instance, **kwargs):
+    clear_tag_bit(instance.bit)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search(sender, instance, **kwargs):
+    update_recipe_search_index(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_search(sender, instance, **kwargs):
+    delete_recipe_search_index(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_pantry_index(sender, instance, **kwargs):
+    transaction.on_commit(partial(pantry_index.remove, instance.id))
+
+
+@receiver(post_save, sender=ShoppingList)
+def add_to_cart(sender, instance, created, **kwargs):
+    if created:
+        add_recipe_to_cart(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingList)
+def remove_from_cart(sender, instance, **kwargs):
+    remove_recipe_from_cart(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=FavoriteRecipes)
+@receiver(post_save, sender=ShoppingList)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(Recipe, instance.recipe_id,
+                      RECIPE_COUNTERS[sender], 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipes)
+@receiver(post_delete, sender=ShoppingList)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    shift_counter(Recipe, instance.recipe_id, RECIPE_COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    shift_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Subscription)
+def increment_followers_count(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(User, instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_followers_count(sender, instance, **kwargs):
+    shift_counter(User, instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        run_on_commit(fan_out_recipe, instance.id)
+
+
+@receiver(post_save, sender=Subscription)
+def add_to_feed(sender, instance, created, **kwargs):
+    if created:
+        add_author_to_feed(instance.user_id, instance.author)
+
+
+@receiver(post_delete, sender=Subscription)
+def remove_from_feed(sender, instance, **kwargs):
+    remove_author_from_feed(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Recipe)
+def delete_replaced_image_derivatives(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    old = Recipe.objects.filter(pk=instance.pk).only('image').first()
+    if old is not None and old.image.name != instance.image.name:
+        instance.has_image_derivatives = False
+        if old.image:
+            run_on_commit(delete_derivatives, old.image)
+
+
+@receiver(post_save, sender=Recipe)
+def create_image_derivatives(sender, instance, **kwargs):
+    if instance.image:
+        run_on_commit(create_recipe_derivatives, instance.id)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_derivatives(sender, instance, **kwargs):
+    if instance.image:
+        run_on_commit(delete_derivatives, instance.image)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    token_cache.invalidate_user(instance.pk)
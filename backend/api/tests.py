@@ -0,0 +1,186 @@
+import threading
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from rest_framework.authtoken.models import Token
+
+from recieps.cart import cart_totals
+from recieps.counters import counter_drift
+from recieps.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCartIngredient, Tag)
+
+User = get_user_model()
+
+THREADS = 8
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Races need row locks and parallel connections of PostgreSQL')
+@mock.patch('recieps.tasks.executor', None)
+class WriteRaceTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user', first_name='Иван',
+            last_name='Иванов', password='password')
+        self.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Пётр', last_name='Петров', password='password')
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Суп', text='Сварить', cooking_time=10)
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, amount=200,
+            ingredient=Ingredient.objects.create(name='Вода',
+                                                 measurement_unit='мл'))
+        self.token = Token.objects.create(user=self.user).key
+
+    @staticmethod
+    def run_parallel(target):
+        barrier = threading.Barrier(THREADS)
+
+        def worker(number):
+            try:
+                barrier.wait()
+                target(number)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(number,))
+                   for number in range(THREADS)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+    def hammer(self, method, url, data=None):
+        responses = []
+
+        def send(number):
+            client = Client(HTTP_AUTHORIZATION=f'Token {self.token}')
+            responses.append(getattr(client, method)(
+                url, data, content_type='application/json'))
+
+        self.run_parallel(send)
+        return responses
+
+    def hammer_codes(self, method, url):
+        return sorted(response.status_code
+                      for response in self.hammer(method, url))
+
+    def assert_consistent(self):
+        self.assertFalse(any(counter_drift().values()), counter_drift())
+        self.assertEqual(
+            set(ShoppingCartIngredient.objects.filter(
+                user=self.user).values_list('ingredient_id', 'amount')),
+            {(row['ingredient_id'], row['total'])
+             for row in cart_totals([self.user])})
+
+    def assert_single_success(self, url, created_count):
+        self.assertEqual(self.hammer_codes('post', url),
+                         [201] + [400] * (THREADS - 1))
+        self.assertEqual(created_count(), 1)
+        self.assert_consistent()
+        self.assertEqual(self.hammer_codes('delete', url),
+                         [204] + [400] * (THREADS - 1))
+        self.assertEqual(created_count(), 0)
+        self.assert_consistent()
+
+    def test_favorite(self):
+        self.assert_single_success(
+            f'/api/recipes/{self.recipe.id}/favorite/',
+            lambda: Recipe.objects.get(pk=self.recipe.pk).favorites_count)
+
+    def test_shopping_cart(self):
+        self.assert_single_success(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/',
+            lambda: Recipe.objects.get(pk=self.recipe.pk).in_carts_count)
+
+    def test_subscribe(self):
+        self.assert_single_success(
+            f'/api/users/{self.author.id}/subscribe/',
+            lambda: User.objects.get(pk=self.author.pk).followers_count)
+
+    def test_subscribe_self(self):
+        self.assertEqual(
+            self.hammer_codes('post',
+                              f'/api/users/{self.user.id}/subscribe/'),
+            [400] * THREADS)
+        self.assert_consistent()
+
+    def test_shopping_cart_batch(self):
+        for method, changed in (('post', 'added'), ('delete', 'removed')):
+            responses = self.hammer(method, '/api/recipes/shopping_cart/',
+                                    {'recipes': [self.recipe.id]})
+            self.assertEqual(
+                sorted(response.json()['results'][0]['status'] == changed
+                       for response in responses),
+                [False] * (THREADS - 1) + [True])
+            self.assert_consistent()
+
+    def test_tag_bits(self):
+        self.run_parallel(lambda number: Tag.objects.create(
+            name=f'Тег {number}', slug=f'tag-{number}'))
+        bits = list(Tag.objects.values_list('bit', flat=True))
+        self.assertEqual(len(bits), THREADS)
+        self.assertEqual(len(set(bits)), THREADS)
+
+
+class ShoppingCartTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user', first_name='Иван',
+            last_name='Иванов', password='password')
+        self.client = Client(HTTP_AUTHORIZATION=(
+            f'Token {Token.objects.create(user=self.user).key}'))
+        self.flour, self.onion, self.salt = (
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('Мука', 'г'), ('Лук', 'шт'), ('Соль', 'г')))
+        self.pie, self.bread = (
+            Recipe.objects.create(author=self.user, name=name, text='Испечь',
+                                  cooking_time=30,
+                                  image='static/recipes/test.png')
+            for name in ('Пирог', 'Хлеб'))
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=self.pie, ingredient=self.flour,
+                             amount=100),
+            RecipeIngredient(recipe=self.pie, ingredient=self.onion,
+                             amount=2),
+            RecipeIngredient(recipe=self.bread, ingredient=self.flour,
+                             amount=200),
+            RecipeIngredient(recipe=self.bread, ingredient=self.salt,
+                             amount=5),
+        ])
+
+    def assert_cart(self, expected, text):
+        self.assertEqual(
+            dict(ShoppingCartIngredient.objects.filter(
+                user=self.user).values_list('ingredient__name', 'amount')),
+            expected)
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content).decode(),
+                         'Список покупок:\n' + text)
+
+    def test_cart_totals_follow_recipes(self):
+        for recipe in (self.pie, self.bread):
+            self.assertEqual(self.client.post(
+                f'/api/recipes/{recipe.id}/shopping_cart/').status_code, 201)
+        self.assert_cart({'Мука': 300, 'Лук': 2, 'Соль': 5},
+                         'Лук - 2 шт\nМука - 300 г\nСоль - 5 г\n')
+
+        response = self.client.patch(
+            f'/api/recipes/{self.pie.id}/',
+            {'ingredients': [{'id': self.flour.id, 'amount': 50},
+                             {'id': self.salt.id, 'amount': 1}]},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_cart({'Мука': 250, 'Соль': 6},
+                         'Мука - 250 г\nСоль - 6 г\n')
+
+        self.assertEqual(self.client.delete(
+            f'/api/recipes/{self.pie.id}/shopping_cart/').status_code, 204)
+        self.assert_cart({'Мука': 200, 'Соль': 5},
+                         'Мука - 200 г\nСоль - 5 г\n')
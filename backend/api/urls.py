@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api.async_views import async_read_urlpatterns
 from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
 
 app_name = 'api'
@@ -16,3 +18,6 @@ urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_read_urlpatterns(router.urls) + urlpatterns
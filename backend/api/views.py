@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Value, Window
+from django.db.models.functions import RowNumber
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as AbstractUserViewSet
@@ -11,37 +13,95 @@ from rest_framework.permissions import (IsAuthenticated,
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from api.filters import IngredientSearch, RecipeFilter
-from api.pagination import CustomPaginator
+from api.caching import VersionedCacheMixin
+from api.constants import SHOPPING_LIST_DEFAULT_FORMAT, USER_KEYSET_ORDERING
+from api.exports import available_exports, shopping_list_rows
+from api.filters import RecipeFilter
+from api.pagination import (CustomPaginator, FeedPaginator,
+                            PageNumberPaginator)
 from api.permissions import AuthorAdminOrReadOnly, IsAuthorOrReadOnly
+from api.search import ingredient_index, pantry_index
 from api.serializers import (FavRecipeCreateSerializer, IngredientSerializer,
+                             MiniRecipeSerializer, PantryRecipeSerializer,
+                             PantrySerializer, RecipeBatchSerializer,
                              RecipeCreateSerializer, RecipeListSerializer,
                              ShoppingListSerializer, SubscribeSerializer,
-                             TagSerializer, UserSubscribesSerializer)
+                             TagSerializer, UserSubscribesSerializer,
+                             get_recipes_limit)
+from recieps.feed import feed_sources
 from recieps.models import (FavoriteRecipes, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingList, Tag)
+                            RecipeIngredient, ShoppingList, SimilarRecipe,
+                            Tag)
+from recieps.selected import add_selected, remove_selected
 from users.models import Subscription
 
 User = get_user_model()
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+def recipe_queryset(user):
+    queryset = Recipe.objects.select_related('author').prefetch_related(
+        'tags',
+        Prefetch('recipeingredient_set',
+                 queryset=RecipeIngredient.objects.select_related(
+                     'ingredient'))
+    )
+    if not user.is_authenticated:
+        return queryset.annotate(is_favorited=Value(False),
+                                 is_in_shopping_cart=Value(False))
+    return queryset.annotate(
+        is_favorited=Exists(FavoriteRecipes.objects.filter(
+            user=user, recipe=OuterRef('pk'))),
+        is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+            user=user, recipe=OuterRef('pk')))
+    )
+
+
+def shopping_cart_response(request, stream=iter):
+    export_format = request.query_params.get(
+        'format', SHOPPING_LIST_DEFAULT_FORMAT)
+    exports = available_exports()
+    if export_format not in exports:
+        return Response(
+            {'format': 'Доступные форматы: '
+                       f'{", ".join(exports)}.'},
+            status=status.HTTP_400_BAD_REQUEST)
+    render, content_type = exports[export_format]
+    response = StreamingHttpResponse(
+        stream(render(shopping_list_rows(request.user))),
+        content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{export_format}"'
+    )
+    return response
+
+
+class TagViewSet(VersionedCacheMixin, ReadOnlyModelViewSet):
+    version_name = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_class = (AuthorAdminOrReadOnly, )
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(VersionedCacheMixin, viewsets.ReadOnlyModelViewSet):
+    version_name = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (DjangoFilterBackend, )
-    filterset_class = IngredientSearch
+
+    def list(self, request, *args, **kwargs):
+        return self.versioned_response(self.search, request, *args, **kwargs)
+
+    def search(self, request, *args, **kwargs):
+        ingredients = ingredient_index.search(
+            request.query_params.get('name', ''))
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
 
 
 class UserViewSet(AbstractUserViewSet):
     queryset = User.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = CustomPaginator
+    keyset_ordering = USER_KEYSET_ORDERING
 
     @action(
         detail=False,
@@ -49,8 +109,14 @@ class UserViewSet(AbstractUserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        authors = User.objects.filter(author__user=user)
+        authors = User.objects.filter(author__user=user).annotate(
+            is_subscribed=Value(True)
+        )
         paginated_queryset = self.paginate_queryset(authors)
+        limit = get_recipes_limit(request)
+        self.attach_recent_recipes(
+            paginated_queryset,
+            self.recent_recipes(paginated_queryset, limit) if limit else ())
         serializer = UserSubscribesSerializer(
             paginated_queryset,
             context={'request': request},
@@ -58,20 +124,40 @@ class UserViewSet(AbstractUserViewSet):
         )
         return self.get_paginated_response(serializer.data)
 
+    @staticmethod
+    def recent_recipes(authors, limit):
+        return Recipe.objects.filter(
+            author__in=authors
+        ).only(
+            'id', 'name', 'image', 'has_image_derivatives', 'cooking_time',
+            'author_id'
+        ).annotate(row_number=Window(
+            RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('created_at').desc(), F('id').desc())
+        )).filter(row_number__lte=limit).order_by('author_id',
+                                                  'row_number')
+
+    @staticmethod
+    def attach_recent_recipes(authors, recipes):
+        recent_recipes = {author.id: [] for author in authors}
+        for recipe in recipes:
+            recent_recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.recent_recipes = recent_recipes[author.id]
+
     @action(
         detail=True,
         methods=('post', 'delete',),
         permission_classes=(IsAuthenticated, ),
         serializer_class=SubscribeSerializer
     )
+    @transaction.atomic
     def subscribe(self, request, id):
         author = get_object_or_404(User, id=id)
         if request.method == 'POST':
             serializer = SubscribeSerializer(
-                data={
-                    'user': request.user.id,
-                    'author': id
-                },
+                data={},
                 context={'request': request}
             )
             serializer.is_valid(raise_exception=True)
@@ -100,37 +186,102 @@ class UserViewSet(AbstractUserViewSet):
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly,)
     pagination_class = CustomPaginator
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        return recipe_queryset(self.request.user)
+
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(
+            request,
+            force=force or self.action == 'download_shopping_cart'
+        )
+
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PUT', 'PATCH'):
             return RecipeCreateSerializer
         return RecipeListSerializer
 
+    @transaction.atomic
     def add_to_selected(self, serializer_class, request, pk):
         user = request.user
         serializer = serializer_class(
-            data={'user': user.id, 'recipe': pk},
+            data={'recipe': pk},
             context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        serializer.save(user=user)
         return Response(serializer.data,
                         status=status.HTTP_201_CREATED)
 
-    def del_selected(self, object_class, request, pk):
-        get_object_or_404(Recipe, id=pk)
-        instance = object_class.objects.filter(user=request.user,
-                                               recipe__id=pk)
-        deleted_count, _ = instance.delete()
-        if deleted_count > 0:
+    @transaction.atomic
+    def del_selected(self, model, request, pk):
+        recipe = get_object_or_404(Recipe, id=pk)
+        if remove_selected(model, request.user.id, [recipe.id]):
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
+    @staticmethod
+    def get_batch(request):
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        existing = set(Recipe.objects.filter(
+            id__in=recipe_ids).values_list('id', flat=True))
+        return recipe_ids, existing
+
+    @staticmethod
+    def batch_response(recipe_ids, existing, changed, changed_status,
+                       unchanged_status):
+        return Response({'results': [
+            {'id': recipe_id,
+             'status': (changed_status if recipe_id in changed
+                        else unchanged_status if recipe_id in existing
+                        else 'not_found')}
+            for recipe_id in recipe_ids
+        ]}, status=status.HTTP_200_OK)
+
+    @transaction.atomic
+    def add_batch_to_selected(self, model, request):
+        recipe_ids, existing = self.get_batch(request)
+        added = add_selected(model, request.user.id, list(existing))
+        return self.batch_response(recipe_ids, existing, set(added),
+                                   'added', 'already_added')
+
+    @transaction.atomic
+    def del_batch_selected(self, model, request):
+        recipe_ids, existing = self.get_batch(request)
+        removed = remove_selected(model, request.user.id, list(existing))
+        return self.batch_response(recipe_ids, existing, set(removed),
+                                   'removed', 'not_selected')
+
+    @action(
+        methods=('POST', 'DELETE',),
+        detail=False,
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        if request.method == 'POST':
+            return self.add_batch_to_selected(FavoriteRecipes, request)
+        return self.del_batch_selected(FavoriteRecipes, request)
+
+    @action(
+        methods=('POST', 'DELETE',),
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        if request.method == 'POST':
+            return self.add_batch_to_selected(ShoppingList, request)
+        return self.del_batch_selected(ShoppingList, request)
+
     @action(
         methods=('POST', 'DELETE',),
         detail=True,
@@ -156,26 +307,59 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.del_selected(ShoppingList, request, pk)
 
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPaginator
+    )
+    def feed(self, request):
+        entries = self.paginator.paginate_querysets(
+            feed_sources(request.user), request, self)
+        recipes = self.get_queryset().in_bulk(
+            [entry.recipe_id for entry in entries])
+        serializer = RecipeListSerializer(
+            [recipes[entry.recipe_id] for entry in entries
+             if entry.recipe_id in recipes],
+            many=True,
+            context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, pagination_class=PageNumberPaginator)
+    def pantry(self, request):
+        serializer = PantrySerializer(data={
+            'ingredients': request.query_params.getlist('ingredients')})
+        serializer.is_valid(raise_exception=True)
+        page = self.paginate_queryset(pantry_index.search(
+            serializer.validated_data['ingredients']))
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in page])
+        for recipe_id, missing_count in page:
+            if recipe_id in recipes:
+                recipes[recipe_id].missing_count = missing_count
+        serializer = PantryRecipeSerializer(
+            [recipes[recipe_id] for recipe_id, _ in page
+             if recipe_id in recipes],
+            many=True,
+            context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True)
+    def similar(self, request, pk):
+        recipes = [entry.similar for entry in SimilarRecipe.objects.filter(
+            recipe_id=pk
+        ).select_related('similar').order_by('-score', 'similar_id')]
+        if not recipes:
+            get_object_or_404(Recipe, id=pk)
+        serializer = MiniRecipeSerializer(recipes, many=True,
+                                          context={'request': request})
+        return Response(serializer.data)
+
     @action(
         methods=('GET',),
         detail=False,
         permission_classes=(IsAuthenticated,)
     )
     def download_shopping_cart(self, request):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shoppinglist__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).order_by('ingredient__name').annotate(Sum('amount'))
-        shopping_list_text = 'Список покупок:\n'
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            amount = ingredient['amount__sum']
-            measurement_unit = ingredient['ingredient__measurement_unit']
-            shopping_list_text += f'{name} - {amount} {measurement_unit}\n'
-        response = HttpResponse(shopping_list_text, content_type='text/plain')
-        response['Content-Disposition'] = (
-            'attachment; filename="shopping_list.txt"'
-        )
-
-        return response
+        return shopping_cart_response(request)
@@ -0,0 +1,305 @@
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+HISTOGRAMS = {
+    'foodgram_http_request_duration_seconds': (
+        'Request wall time by view',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'foodgram_db_queries_per_request': (
+        'Database queries per request by view',
+        (1, 2, 5, 10, 20, 50, 100, 200),
+    ),
+    'foodgram_db_duration_seconds': (
+        'Database time per request by view',
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    ),
+    'foodgram_http_response_size_bytes': (
+        'Response body size by view',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    ),
+}
+COUNTERS = {}
+UNRESOLVED_VIEW = 'unresolved'
+DEAD_PROCESSES_FILE = 'dead.json'
+
+
+def read_values(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_values(path, histograms, counters):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump({'histograms': histograms, 'counters': counters}, file)
+    os.replace(temporary, path)
+
+
+def merge_values(histograms, counters, values):
+    for name, value in values.get('counters', {}).items():
+        counters[name] = counters.get(name, 0) + value
+    for name, series in values.get('histograms', {}).items():
+        if name not in histograms:
+            continue
+        for key, histogram in series.items():
+            total = histograms[name].setdefault(
+                key, {'buckets': [0] * len(histogram['buckets']),
+                      'sum': 0, 'count': 0})
+            total['buckets'] = [
+                left + right for left, right
+                in zip(total['buckets'], histogram['buckets'])
+            ]
+            total['sum'] += histogram['sum']
+            total['count'] += histogram['count']
+
+
+class MetricsRegistry:
+    def __init__(self, directory, flush_interval):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.pid = None
+        self.lock = threading.Lock()
+        self.values = {name: {} for name in HISTOGRAMS}
+        self.counters = {}
+        self.last_flush = 0
+        self.dirty = False
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.flush)
+
+    def process_path(self):
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.values = {name: {} for name in HISTOGRAMS}
+            self.counters = {}
+            self.file = os.path.join(
+                self.directory, f'{self.pid}-{uuid.uuid4().hex}.json')
+        return self.file
+
+    def observe(self, view, method, observations):
+        self.process_path()
+        key = f'{view}|{method}'
+        with self.lock:
+            for name, value in observations.items():
+                buckets = HISTOGRAMS[name][1]
+                histogram = self.values[name].setdefault(
+                    key, {'buckets': [0] * (len(buckets) + 1),
+                          'sum': 0, 'count': 0})
+                histogram['buckets'][bisect_left(buckets, value)] += 1
+                histogram['sum'] += value
+                histogram['count'] += 1
+            self.dirty = True
+            due = time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def register_counter(self, name, description):
+        COUNTERS[name] = description
+
+    def increment(self, name, amount=1):
+        self.process_path()
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            self.dirty = True
+
+    def flush(self):
+        path = self.process_path()
+        with self.lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            self.last_flush = time.monotonic()
+            write_values(path, self.values, self.counters)
+
+    def collect(self):
+        self.flush()
+        histograms = {name: {} for name in HISTOGRAMS}
+        counters = {}
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.json'):
+                merge_values(histograms, counters, read_values(
+                    os.path.join(self.directory, filename)))
+        return histograms, {name: counters.get(name, 0)
+                            for name in COUNTERS}
+
+    def mark_process_dead(self, pid):
+        paths = [os.path.join(self.directory, filename)
+                 for filename in os.listdir(self.directory)
+                 if filename.startswith(f'{pid}-')
+                 and filename.endswith('.json')]
+        if not paths:
+            return
+        archive = os.path.join(self.directory, DEAD_PROCESSES_FILE)
+        histograms = {name: {} for name in HISTOGRAMS}
+        counters = {}
+        for path in (archive, *paths):
+            merge_values(histograms, counters, read_values(path))
+        write_values(archive, histograms, counters)
+        for path in paths:
+            os.remove(path)
+
+    def clear(self):
+        for filename in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, filename))
+
+    def render(self):
+        lines = []
+        histograms, counters = self.collect()
+        for name, value in counters.items():
+            lines.append(f'# HELP {name} {COUNTERS[name]}')
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name} {value}')
+        for name, series in histograms.items():
+            description, buckets = HISTOGRAMS[name]
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} histogram')
+            for key in sorted(series):
+                histogram = series[key]
+                view, method = key.split('|', 1)
+                labels = f'view="{view}",method="{method}"'
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',),
+                                        histogram['buckets']):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket{{{labels},le="{bound}"}} '
+                        f'{cumulative}')
+                lines.append(f'{name}_sum{{{labels}}} {histogram["sum"]}')
+                lines.append(
+                    f'{name}_count{{{labels}}} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry(settings.METRICS_DIR,
+                           settings.METRICS_FLUSH_INTERVAL)
+
+
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        token = current_recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.process_response(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        token = current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.process_response(request, response, recorder, start)
+
+    def process_response(self, request, response, recorder, start):
+        match = request.resolver_match
+        view = match.url_name or match.view_name if match else None
+        view = view or UNRESOLVED_VIEW
+        if response.streaming:
+            count_streaming = (self.acount_streaming if response.is_async
+                               else self.count_streaming)
+            response.streaming_content = count_streaming(
+                response.streaming_content, view, request.method, recorder,
+                start)
+        else:
+            self.observe(view, request.method, recorder, start,
+                         len(response.content))
+        return response
+
+    def count_streaming(self, content, view, method, recorder, start):
+        size = 0
+        token = current_recorder.set(recorder)
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            current_recorder.reset(token)
+        self.observe(view, method, recorder, start, size)
+
+    async def acount_streaming(self, content, view, method, recorder,
+                               start):
+        size = 0
+        token = current_recorder.set(recorder)
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            current_recorder.reset(token)
+        self.observe(view, method, recorder, start, size)
+
+    @staticmethod
+    def observe(view, method, recorder, start, size):
+        registry.observe(view, method, {
+            'foodgram_http_request_duration_seconds':
+                time.perf_counter() - start,
+            'foodgram_db_queries_per_request': recorder.count,
+            'foodgram_db_duration_seconds': recorder.duration,
+            'foodgram_http_response_size_bytes': size,
+        })
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
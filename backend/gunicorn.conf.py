@@ -0,0 +1,13 @@
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
+
+from foodgram_backend.metrics import registry  # noqa: E402
+
+
+def on_starting(server):
+    registry.clear()
+
+
+def child_exit(server, worker):
+    registry.mark_process_dead(worker.pid)
@@ -1,7 +1,9 @@
 from django.contrib import admin
 
-from recieps.models import (FavoriteRecipes, Ingredient, Recipe, ShoppingList,
-                            Tag)
+from recieps.models import (FavoriteRecipes, FeedEntry, Ingredient, Recipe,
+                            ShoppingCartIngredient, ShoppingList,
+                            SimilarRecipe, Tag)
+from recieps.tags import rebuild_tags_masks
 from users.models import Subscription
 
 
@@ -10,9 +12,14 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('name', 'author', 'tags')
 
     def get_favorites_count(self, obj):
-        return FavoriteRecipes.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
     get_favorites_count.short_description = 'Число избранного'
+    get_favorites_count.admin_order_field = 'favorites_count'
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        rebuild_tags_masks([form.instance.pk])
 
 
 class IngredientAdmin(admin.ModelAdmin):
@@ -24,4 +31,7 @@ admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag)
 admin.site.register(FavoriteRecipes)
 admin.site.register(ShoppingList)
+admin.site.register(ShoppingCartIngredient)
 admin.site.register(Subscription)
+admin.site.register(FeedEntry)
+admin.site.register(SimilarRecipe)
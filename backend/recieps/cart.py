@@ -0,0 +1,88 @@
+from django.db import connection
+from django.db.models import Sum
+
+from recieps.models import (RecipeIngredient, ShoppingCartIngredient,
+                            ShoppingList)
+
+CART_TABLE = ShoppingCartIngredient._meta.db_table
+RECIPE_INGREDIENT_TABLE = RecipeIngredient._meta.db_table
+SHOPPING_LIST_TABLE = ShoppingList._meta.db_table
+
+UPSERT_SQL = (
+    f'INSERT INTO {CART_TABLE} (user_id, ingredient_id, amount) {{select}} '
+    'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+    f'SET amount = {CART_TABLE}.amount + EXCLUDED.amount'
+)
+
+
+def upsert_cart(select, params):
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_SQL.format(select=select), params)
+
+
+def add_recipe_to_cart(user_id, recipe_id, sign=1):
+    add_recipes_to_cart(user_id, [recipe_id], sign)
+
+
+def remove_recipe_from_cart(user_id, recipe_id):
+    add_recipe_to_cart(user_id, recipe_id, sign=-1)
+
+
+def add_recipes_to_cart(user_id, recipe_ids, sign=1):
+    if not recipe_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    upsert_cart(
+        f'SELECT %s, ingredient_id, %s * SUM(amount) '
+        f'FROM {RECIPE_INGREDIENT_TABLE} '
+        f'WHERE recipe_id IN ({placeholders}) '
+        'GROUP BY ingredient_id ORDER BY ingredient_id',
+        [user_id, sign, *recipe_ids]
+    )
+    if sign < 0:
+        ShoppingCartIngredient.objects.filter(
+            user_id=user_id, amount__lte=0).delete()
+
+
+def remove_recipes_from_cart(user_id, recipe_ids):
+    add_recipes_to_cart(user_id, recipe_ids, sign=-1)
+
+
+def change_recipe_in_carts(recipe, old_amounts, new_amounts):
+    changed = False
+    for ingredient_id in sorted(old_amounts.keys() | new_amounts.keys()):
+        delta = (new_amounts.get(ingredient_id, 0)
+                 - old_amounts.get(ingredient_id, 0))
+        if not delta:
+            continue
+        changed = True
+        upsert_cart(
+            f'SELECT user_id, %s, %s FROM {SHOPPING_LIST_TABLE} '
+            'WHERE recipe_id = %s ORDER BY user_id',
+            [ingredient_id, delta, recipe.id]
+        )
+    if changed:
+        ShoppingCartIngredient.objects.filter(
+            user__shoppinglist__recipe=recipe, amount__lte=0).delete()
+
+
+def cart_totals(users=None):
+    selected = {'recipe__shoppinglist__isnull': False}
+    if users is not None:
+        selected = {'recipe__shoppinglist__user__in': users}
+    return RecipeIngredient.objects.filter(**selected).values(
+        'recipe__shoppinglist__user_id', 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+
+
+def rebuild_carts(users=None):
+    carts = ShoppingCartIngredient.objects.all()
+    if users is not None:
+        carts = carts.filter(user__in=users)
+    carts.delete()
+    return len(ShoppingCartIngredient.objects.bulk_create(
+        ShoppingCartIngredient(user_id=row['recipe__shoppinglist__user_id'],
+                               ingredient_id=row['ingredient_id'],
+                               amount=row['total'])
+        for row in cart_totals(users).iterator()
+    ))
@@ -3,3 +3,20 @@ MAX_MEASURMENT_UNIT_LENGTH = 200
 MAX_TAG_NAME_LENGTH = 200
 MAX_TAG_SLUG_LENGTH = 200
 MAX_RECIPE_NAME_LENGTH = 200
+MAX_DATA_VERSION_NAME_LENGTH = 50
+MAX_TAGS = 63
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 100
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_MAX_INGREDIENT_RECIPES = 2000
+RECIPE_IMAGE_SIZES = {
+    'small': 320,
+    'medium': 640,
+}
+RECIPE_IMAGE_FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True,
+                             'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+RECIPE_IMAGE_DERIVATIVES_DIR = 'derivatives'
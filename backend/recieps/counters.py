@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recieps.models import FavoriteRecipes, Recipe, ShoppingList
+from recieps.tags import rebuild_tags_masks
+from users.models import Subscription
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipes, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingList, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+)
+
+RECIPE_COUNTERS = {
+    FavoriteRecipes: 'favorites_count',
+    ShoppingList: 'in_carts_count',
+}
+
+
+def shift_counter(model, pk, field, delta):
+    shift_counters(model, [pk], field, delta)
+
+
+def shift_counters(model, pks, field, delta):
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def drifted_counters(model, field, source, source_field):
+    true_count = Coalesce(Subquery(
+        source.objects.filter(
+            **{source_field: OuterRef('pk')}
+        ).order_by().values(source_field).annotate(
+            total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+    return model.objects.annotate(true_count=true_count).filter(
+        ~Q(**{field: F('true_count')})), true_count
+
+
+def counter_drift():
+    return {
+        f'{model.__name__}.{field}': drifted_counters(
+            model, field, source, source_field)[0].count()
+        for model, field, source, source_field in COUNTERS
+    }
+
+
+def reconcile_counters():
+    fixed = {}
+    for model, field, source, source_field in COUNTERS:
+        drifted, true_count = drifted_counters(model, field, source,
+                                               source_field)
+        fixed[f'{model.__name__}.{field}'] = drifted.update(
+            **{field: true_count})
+    fixed['Recipe.tags_mask'] = rebuild_tags_masks()
+    return fixed
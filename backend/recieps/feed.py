@@ -0,0 +1,82 @@
+from django.db.models import F
+
+from recieps.constants import (FEED_BACKFILL_SIZE, FEED_FANOUT_BATCH_SIZE,
+                               FEED_FANOUT_MAX_FOLLOWERS)
+from recieps.models import FeedEntry, Recipe
+from users.models import Subscription
+
+
+def is_popular(author):
+    return author.followers_count >= FEED_FANOUT_MAX_FOLLOWERS
+
+
+def fan_out_recipe(recipe_id):
+    recipe = Recipe.objects.select_related('author').only(
+        'created_at', 'author__followers_count').filter(
+        pk=recipe_id).order_by().first()
+    if recipe is None or is_popular(recipe.author):
+        return 0
+    followers = Subscription.objects.filter(
+        author_id=recipe.author_id).values_list('user_id', flat=True)
+    return len(FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe.id,
+                   created_at=recipe.created_at)
+         for user_id in followers.iterator()),
+        batch_size=FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True
+    ))
+
+
+def fan_out_recipes(recipe_ids):
+    entries = Subscription.objects.filter(
+        author__recipes__in=recipe_ids,
+        author__followers_count__lt=FEED_FANOUT_MAX_FOLLOWERS
+    ).values_list('user_id', 'author__recipes__id',
+                  'author__recipes__created_at')
+    return len(FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                   created_at=created_at)
+         for user_id, recipe_id, created_at in entries.iterator()),
+        batch_size=FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True
+    ))
+
+
+def add_author_to_feed(user_id, author):
+    if is_popular(author):
+        return 0
+    recipes = Recipe.objects.filter(author=author).order_by(
+        '-created_at', '-id').values_list('id', 'created_at')
+    return len(FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                   created_at=created_at)
+         for recipe_id, created_at in recipes[:FEED_BACKFILL_SIZE]),
+        ignore_conflicts=True
+    ))
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id,
+                             recipe__author_id=author_id).delete()
+
+
+def feed_sources(user):
+    popular_authors = Subscription.objects.filter(
+        user=user, author__followers_count__gte=FEED_FANOUT_MAX_FOLLOWERS
+    ).values('author_id')
+    return (
+        FeedEntry.objects.filter(user=user),
+        Recipe.objects.filter(author__in=popular_authors).annotate(
+            recipe_id=F('id')),
+    )
+
+
+def rebuild_feeds(users=None):
+    entries = FeedEntry.objects.all()
+    subscriptions = Subscription.objects.select_related('author')
+    if users is not None:
+        entries = entries.filter(user__in=users)
+        subscriptions = subscriptions.filter(user__in=users)
+    entries.delete()
+    return sum(add_author_to_feed(subscription.user_id, subscription.author)
+               for subscription in subscriptions.iterator())
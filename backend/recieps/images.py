@@ -0,0 +1,88 @@
+import io
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .constants import (RECIPE_IMAGE_DERIVATIVES_DIR, RECIPE_IMAGE_FORMATS,
+                        RECIPE_IMAGE_SIZES)
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+
+def derivative_name(name, size, image_format):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    extension = RECIPE_IMAGE_FORMATS[image_format][1]
+    return posixpath.join(directory, RECIPE_IMAGE_DERIVATIVES_DIR,
+                          f'{stem}_{size}.{extension}')
+
+
+def derivative_names(name):
+    return [derivative_name(name, size, image_format)
+            for size in RECIPE_IMAGE_SIZES
+            for image_format in RECIPE_IMAGE_FORMATS]
+
+
+def has_derivatives(image):
+    return all(image.storage.exists(name)
+               for name in derivative_names(image.name))
+
+
+def generate_derivatives(image):
+    with image.storage.open(image.name, 'rb') as file:
+        source = ImageOps.exif_transpose(Image.open(file))
+        source = source.convert('RGB')
+    for size, width in RECIPE_IMAGE_SIZES.items():
+        resized = source.copy()
+        resized.thumbnail((width, width), Image.LANCZOS)
+        for image_format, (pil_format, _, options) in (
+                RECIPE_IMAGE_FORMATS.items()):
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = derivative_name(image.name, size, image_format)
+            if image.storage.exists(name):
+                image.storage.delete(name)
+            image.storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def create_recipe_derivatives(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'has_image_derivatives').first()
+    if recipe is None or not recipe.image or recipe.has_image_derivatives:
+        return
+    try:
+        if not has_derivatives(recipe.image):
+            generate_derivatives(recipe.image)
+    except OSError:
+        logger.warning('Не удалось обработать изображение %s',
+                       recipe.image.name, exc_info=True)
+        return
+    Recipe.objects.filter(pk=recipe_id, image=recipe.image.name).update(
+        has_image_derivatives=True)
+
+
+def delete_derivatives(image):
+    for name in derivative_names(image.name):
+        if image.storage.exists(name):
+            image.storage.delete(name)
+
+
+def derivative_urls(recipe, request=None):
+    image = recipe.image
+    if not image:
+        return None
+    if not recipe.has_image_derivatives:
+        return {}
+    urls = {}
+    for size in RECIPE_IMAGE_SIZES:
+        urls[size] = {}
+        for image_format in RECIPE_IMAGE_FORMATS:
+            url = image.storage.url(
+                derivative_name(image.name, size, image_format))
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[size][image_format] = url
+    return urls
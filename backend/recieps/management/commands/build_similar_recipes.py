@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recieps.similarity import build_similar_recipes
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the similar recipes table: top neighbours of every '
+            'recipe by cosine similarity of ingredient sets weighted by '
+            'inverse recipe frequency. Recipe edits refresh their own '
+            'neighbours incrementally; run this periodically to pick up '
+            'drift in ingredient weights.')
+
+    def handle(self, *args, **options):
+        created = build_similar_recipes()
+        self.stdout.write(self.style.SUCCESS(
+            f'Similar recipes rebuilt: {created} rows'))
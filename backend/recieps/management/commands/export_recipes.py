@@ -0,0 +1,77 @@
+import json
+import tarfile
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from recieps.models import Recipe, RecipeIngredient
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Exports recipes as NDJSON and their images as a tar archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the NDJSON file')
+        parser.add_argument('--media', help='Path of the media .tar.gz')
+        parser.add_argument('--chunk-size', type=int,
+                            default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch('recipeingredient_set',
+                     queryset=RecipeIngredient.objects.select_related(
+                         'ingredient'))
+        ).order_by('created_at', 'id')
+        archive = (tarfile.open(options['media'], 'w|gz')
+                   if options['media'] else None)
+        exported = 0
+        try:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                for recipe in recipes.iterator(
+                        chunk_size=options['chunk_size']):
+                    output.write(json.dumps(
+                        self.serialize(recipe), ensure_ascii=False) + '\n')
+                    if archive is not None and recipe.image:
+                        self.add_image(archive, recipe.image)
+                    exported += 1
+                    if exported % options['chunk_size'] == 0:
+                        self.stdout.write(f'Exported {exported} recipes')
+        finally:
+            if archive is not None:
+                archive.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Recipes exported successfully: {exported}'))
+
+    @staticmethod
+    def serialize(recipe):
+        return {
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'created_at': recipe.created_at.isoformat(),
+            'author': recipe.author.email,
+            'image': recipe.image.name,
+            'tags': [{'name': tag.name, 'slug': tag.slug, 'color': tag.color}
+                     for tag in recipe.tags.all()],
+            'ingredients': [
+                {'name': item.ingredient.name,
+                 'measurement_unit': item.ingredient.measurement_unit,
+                 'amount': item.amount}
+                for item in recipe.recipeingredient_set.all()
+            ],
+        }
+
+    def add_image(self, archive, image):
+        try:
+            file = image.storage.open(image.name, 'rb')
+        except FileNotFoundError:
+            self.stdout.write(self.style.WARNING(
+                f'Image not found: {image.name}'))
+            return
+        with file:
+            info = tarfile.TarInfo(image.name)
+            info.size = image.storage.size(image.name)
+            archive.addfile(info, file)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from recieps.images import generate_derivatives, has_derivatives
+from recieps.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Generates resized JPEG/WebP variants of recipe images and marks '
+            'the recipes that have them')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate existing variants')
+
+    def handle(self, *args, **options):
+        generated = skipped = 0
+        failed = []
+        recipes = Recipe.objects.exclude(image='').only('id', 'image')
+        for recipe in recipes.iterator():
+            if not options['force'] and has_derivatives(recipe.image):
+                skipped += 1
+                continue
+            try:
+                generate_derivatives(recipe.image)
+                generated += 1
+            except OSError as e:
+                failed.append(recipe.id)
+                self.stdout.write(self.style.ERROR(
+                    f'Error processing {recipe.image.name}: {e}'))
+        recipes.exclude(pk__in=failed).update(has_image_derivatives=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated: {generated}, skipped: {skipped}, '
+            f'failed: {len(failed)}'))
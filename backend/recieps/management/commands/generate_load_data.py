@@ -0,0 +1,180 @@
+import io
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from api.search import index_recipes
+from recieps.cart import rebuild_carts
+from recieps.counters import reconcile_counters
+from recieps.images import generate_derivatives, has_derivatives
+from recieps.models import (DataVersion, FavoriteRecipes, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingList, Tag)
+from recieps.tags import tags_mask
+from users.models import Subscription
+
+User = get_user_model()
+
+LOAD_PASSWORD = 'loadtest-password'
+LOAD_IMAGE_NAME = 'static/recipes/loadtest.jpg'
+LOAD_TAGS = (('Завтрак', 'breakfast', '#E26C2D'),
+             ('Обед', 'lunch', '#49B64E'),
+             ('Ужин', 'dinner', '#8775D2'))
+WORDS = ('суп', 'салат', 'пирог', 'каша', 'рагу', 'запеканка', 'паста',
+         'soup', 'salad', 'pie', 'stew', 'curry', 'omelette', 'pancakes')
+BATCH_SIZE = 1000
+ZIPF_EXPONENT = 1.1
+
+
+def zipf_popularity(rng, population):
+    population = rng.sample(population, len(population))
+    return population, list(accumulate(
+        1 / (rank ** ZIPF_EXPONENT)
+        for rank in range(1, len(population) + 1)))
+
+
+def unique_pairs(rng, count, left, right, exclude_equal=False):
+    left, left_weights = zipf_popularity(rng, left)
+    right, right_weights = zipf_popularity(rng, right)
+    pairs = set()
+    attempts = count * 10
+    while len(pairs) < count and attempts:
+        attempts -= 1
+        first = rng.choices(left, cum_weights=left_weights)[0]
+        second = rng.choices(right, cum_weights=right_weights)[0]
+        if exclude_equal and first == second:
+            continue
+        pairs.add((first, second))
+    return pairs
+
+
+class Command(BaseCommand):
+    help = ('Fills the database with synthetic users, recipes, favorites, '
+            'shopping carts and subscriptions with a Zipf-like skew')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--favorites', type=int, default=10000)
+        parser.add_argument('--carts', type=int, default=5000)
+        parser.add_argument('--subscriptions', type=int, default=2000)
+        parser.add_argument('--max-ingredients', type=int, default=12)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            ingredients = self.ensure_ingredients()
+            tags = self.ensure_tags()
+            image = self.ensure_image()
+            users = self.create_users(options['users'])
+            recipes = self.create_recipes(rng, options['recipes'], users,
+                                          ingredients, tags, image,
+                                          options['max_ingredients'])
+            self.create_pairs(rng, FavoriteRecipes, options['favorites'],
+                              users, recipes)
+            self.create_pairs(rng, ShoppingList, options['carts'],
+                              users, recipes)
+            subscriptions = unique_pairs(rng, options['subscriptions'],
+                                         users, users, exclude_equal=True)
+            Subscription.objects.bulk_create(
+                (Subscription(user_id=user, author_id=author)
+                 for user, author in subscriptions),
+                batch_size=BATCH_SIZE, ignore_conflicts=True)
+            rebuild_carts(users)
+            reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(users)} users, {len(recipes)} recipes. '
+            f'Password for all users: {LOAD_PASSWORD}'))
+
+    def ensure_ingredients(self):
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredients:
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+                for number in range(500))
+            DataVersion.bump('ingredients')
+            ingredients = list(Ingredient.objects.values_list('id',
+                                                              flat=True))
+        return ingredients
+
+    def ensure_tags(self):
+        Tag.objects.bulk_create(
+            (Tag(name=name, slug=slug, color=color)
+             for name, slug, color in LOAD_TAGS),
+            ignore_conflicts=True)
+        DataVersion.bump('tags')
+        return list(Tag.objects.only('id', 'bit'))
+
+    def ensure_image(self):
+        if not default_storage.exists(LOAD_IMAGE_NAME):
+            buffer = io.BytesIO()
+            Image.new('RGB', (1200, 900), '#E8A33D').save(buffer, 'JPEG')
+            default_storage.save(LOAD_IMAGE_NAME,
+                                 ContentFile(buffer.getvalue()))
+        image = Recipe(image=LOAD_IMAGE_NAME).image
+        if not has_derivatives(image):
+            generate_derivatives(image)
+        return LOAD_IMAGE_NAME
+
+    def create_users(self, count):
+        start = User.objects.count()
+        password = make_password(LOAD_PASSWORD)
+        users = User.objects.bulk_create(
+            (User(username=f'loadtest_{start + number}',
+                  email=f'loadtest_{start + number}@example.com',
+                  first_name='Нагрузка',
+                  last_name=f'Тест {start + number}',
+                  password=password)
+             for number in range(count)),
+            batch_size=BATCH_SIZE)
+        return [user.id for user in users]
+
+    def create_recipes(self, rng, count, users, ingredients, tags, image,
+                       max_ingredients):
+        authors, author_weights = zipf_popularity(rng, users)
+        now = timezone.now()
+        recipe_tags = [rng.sample(tags, rng.randint(1, len(tags)))
+                       for _ in range(count)]
+        recipes = Recipe.objects.bulk_create(
+            (Recipe(author_id=rng.choices(authors,
+                                          cum_weights=author_weights)[0],
+                    name=' '.join(rng.sample(WORDS, 2)).capitalize(),
+                    text=' '.join(rng.choices(WORDS, k=30)),
+                    cooking_time=rng.randint(5, 180),
+                    image=image,
+                    has_image_derivatives=True,
+                    created_at=now - timedelta(
+                        minutes=rng.randint(0, 365 * 24 * 60)),
+                    tags_mask=tags_mask(selected_tags))
+             for selected_tags in recipe_tags),
+            batch_size=BATCH_SIZE)
+        RecipeIngredient.objects.bulk_create(
+            (RecipeIngredient(recipe_id=recipe.id, ingredient_id=ingredient,
+                              amount=rng.randint(1, 500))
+             for recipe in recipes
+             for ingredient in rng.sample(
+                 ingredients,
+                 min(len(ingredients), rng.randint(1, max_ingredients)))),
+            batch_size=BATCH_SIZE)
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+             for recipe, selected_tags in zip(recipes, recipe_tags)
+             for tag in selected_tags),
+            batch_size=BATCH_SIZE)
+        index_recipes(recipes)
+        return [recipe.id for recipe in recipes]
+
+    def create_pairs(self, rng, model, count, users, recipes):
+        pairs = unique_pairs(rng, count, users, recipes)
+        model.objects.bulk_create(
+            (model(user_id=user, recipe_id=recipe) for user, recipe in pairs),
+            batch_size=BATCH_SIZE, ignore_conflicts=True)
@@ -1,27 +1,115 @@
+import csv
 import json
+import os
+from itertools import islice
 
 from django.core.exceptions import ValidationError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from recieps.models import Ingredient
+from recieps.models import DataVersion, Ingredient
+
+DEFAULT_PATH = 'data/ingredients.json'
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+FIELDS = ('name', 'measurement_unit')
+
+
+def iter_json_array(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != '[':
+                    raise CommandError('JSON file must contain an array')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise CommandError('Malformed JSON file')
+            else:
+                yield item
+                continue
+        if eof:
+            raise CommandError('Unexpected end of JSON file')
+        chunk = file.read(READ_CHUNK_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_csv_rows(file):
+    for row in csv.reader(file):
+        if not row or tuple(row[:2]) == FIELDS:
+            continue
+        yield dict(zip(FIELDS, row))
 
 
 class Command(BaseCommand):
-    help = 'Imports data from a JSON file into the database'
-
-    def handle(self, *args, **kwargs):
-        json_file = 'data/ingredients.json'
-        with open(json_file, 'r') as file:
-            data = json.load(file)
-            for item in data:
-                try:
-                    product = Ingredient(**item)
-                    product.full_clean()
-                    product.save()
-                except ValidationError as e:
-                    self.stdout.write(self.style.ERROR(f'Error import {item}: '
-                                                       f'{e.message_dict}'))
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f'Error import {item}'
-                                                       f': {str(e)}'))
-        self.stdout.write(self.style.SUCCESS('Data imported successfully'))
+    help = 'Imports ingredients from a JSON or CSV file into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument('--format', choices=('json', 'csv'),
+                            help='File format, detected by extension '
+                                 'if omitted')
+        parser.add_argument('--batch-size', type=int,
+                            default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        readers = {'json': iter_json_array, 'csv': iter_csv_rows}
+        if file_format not in readers:
+            raise CommandError(f'Unsupported file format: {file_format}')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+
+        fields = {name: Ingredient._meta.get_field(name) for name in FIELDS}
+        count_before = Ingredient.objects.count()
+        processed = invalid = 0
+        with open(path, 'r', encoding='utf-8') as file:
+            items = readers[file_format](file)
+            while True:
+                batch = list(islice(items, batch_size))
+                if not batch:
+                    break
+                ingredients = {}
+                for item in batch:
+                    try:
+                        values = {
+                            name: field.clean(str(item.get(name, '')).strip(),
+                                              None)
+                            for name, field in fields.items()
+                        }
+                    except (ValidationError, AttributeError) as e:
+                        invalid += 1
+                        self.stdout.write(self.style.ERROR(
+                            f'Error import {item}: {e}'))
+                        continue
+                    key = (values['name'], values['measurement_unit'])
+                    ingredients[key] = Ingredient(**values)
+                Ingredient.objects.bulk_create(ingredients.values(),
+                                               ignore_conflicts=True)
+                processed += len(batch)
+                self.stdout.write(f'Processed {processed} rows')
+
+        created = Ingredient.objects.count() - count_before
+        if created:
+            DataVersion.bump('ingredients')
+        self.stdout.write(self.style.SUCCESS(
+            f'Data imported successfully: {processed} rows, '
+            f'{created} created, {processed - invalid - created} '
+            f'already existed or duplicated, {invalid} invalid'))
@@ -0,0 +1,198 @@
+import json
+import os
+import tarfile
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from api.search import index_recipes
+from recieps.counters import reconcile_counters
+from recieps.feed import fan_out_recipes
+from recieps.models import (DataVersion, Ingredient, Recipe, RecipeIngredient,
+                            Tag)
+from recieps.tags import tags_mask
+
+User = get_user_model()
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = ('Imports recipes from an NDJSON file made by export_recipes. '
+            'Progress is saved after every batch, so an interrupted import '
+            'resumes where it stopped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Path of the NDJSON file')
+        parser.add_argument('--media', help='Path of the media .tar.gz')
+        parser.add_argument('--batch-size', type=int,
+                            default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--state',
+                            help='Progress file, <input>.progress by default')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore saved progress')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        if options['media']:
+            self.import_media(options['media'])
+        state_path = options['state'] or f'{options["input"]}.progress'
+        done = 0
+        if not options['restart'] and os.path.exists(state_path):
+            with open(state_path) as state:
+                done = int(state.read().strip() or 0)
+            self.stdout.write(f'Resuming after line {done}')
+
+        reference_counts = (Ingredient.objects.count(), Tag.objects.count())
+        created = skipped = 0
+        with open(options['input'], encoding='utf-8') as file:
+            lines = islice(file, done, None)
+            while True:
+                batch = [json.loads(line)
+                         for line in islice(lines, options['batch_size'])
+                         if line.strip()]
+                if not batch:
+                    break
+                with transaction.atomic():
+                    batch_created = self.import_batch(batch)
+                created += batch_created
+                skipped += len(batch) - batch_created
+                done += len(batch)
+                with open(state_path, 'w') as state:
+                    state.write(str(done))
+                self.stdout.write(f'Processed {done} recipes')
+
+        ingredients_count, tags_count = reference_counts
+        if Ingredient.objects.count() != ingredients_count:
+            DataVersion.bump('ingredients')
+        if Tag.objects.count() != tags_count:
+            DataVersion.bump('tags')
+        if created:
+            DataVersion.bump('pantry')
+        reconcile_counters()
+        call_command('generate_image_derivatives', stdout=self.stdout)
+        if created:
+            call_command('build_similar_recipes', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Recipes imported successfully: {created} created, '
+            f'{skipped} skipped'))
+
+    def import_media(self, path):
+        saved = 0
+        with tarfile.open(path, 'r|*') as archive:
+            for member in archive:
+                name = os.path.normpath(member.name)
+                if (not member.isfile() or name.startswith('..')
+                        or os.path.isabs(name)):
+                    continue
+                if default_storage.exists(name):
+                    continue
+                default_storage.save(name, archive.extractfile(member))
+                saved += 1
+        self.stdout.write(f'Media files saved: {saved}')
+
+    def import_batch(self, batch):
+        authors = dict(User.objects.filter(
+            email__in={row['author'] for row in batch}
+        ).values_list('email', 'id'))
+        tags = self.resolve_tags(batch)
+        ingredients = self.resolve_ingredients(batch)
+
+        keys = {(authors.get(row['author']), row['name'],
+                 parse_datetime(row['created_at'])) for row in batch}
+        existing = set(Recipe.objects.filter(
+            author_id__in={author for author, _, _ in keys},
+            name__in={name for _, name, _ in keys},
+        ).values_list('author_id', 'name', 'created_at'))
+
+        rows = []
+        for row in batch:
+            author = authors.get(row['author'])
+            key = (author, row['name'], parse_datetime(row['created_at']))
+            if author is None:
+                self.stdout.write(self.style.ERROR(
+                    f'Author not found for {row["name"]}: {row["author"]}'))
+                continue
+            missing_tags = [tag['slug'] for tag in row['tags']
+                            if tag['slug'] not in tags]
+            if missing_tags:
+                self.stdout.write(self.style.ERROR(
+                    f'Tags not found for {row["name"]}: '
+                    f'{", ".join(missing_tags)}'))
+                continue
+            if key in existing:
+                continue
+            existing.add(key)
+            rows.append((row, Recipe(author_id=author,
+                                     name=row['name'],
+                                     text=row['text'],
+                                     cooking_time=row['cooking_time'],
+                                     created_at=key[2],
+                                     image=row['image'],
+                                     tags_mask=tags_mask(
+                                         tags[tag['slug']]
+                                         for tag in row['tags']))))
+        recipes = Recipe.objects.bulk_create(recipe for _, recipe in rows)
+
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=recipe.id,
+                ingredient_id=ingredients[(item['name'],
+                                           item['measurement_unit'])],
+                amount=item['amount'])
+            for (row, _), recipe in zip(rows, recipes)
+            for item in row['ingredients']
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id,
+                                tag_id=tags[tag['slug']].id)
+            for (row, _), recipe in zip(rows, recipes)
+            for tag in row['tags']
+        )
+        index_recipes(recipes)
+        fan_out_recipes([recipe.id for recipe in recipes])
+        return len(recipes)
+
+    def resolve_tags(self, batch):
+        exported = {tag['slug']: tag for row in batch for tag in row['tags']}
+        tags = {tag.slug: tag for tag in Tag.objects.filter(
+            slug__in=exported).only('id', 'slug', 'bit')}
+        taken = dict(Tag.objects.filter(
+            name__in={tag['name'] for slug, tag in exported.items()
+                      if slug not in tags}
+        ).values_list('name', 'slug'))
+        new_tags = []
+        for slug, tag in exported.items():
+            if slug in tags:
+                continue
+            if tag['name'] in taken:
+                self.stdout.write(self.style.ERROR(
+                    f'Tag {slug} conflicts with tag {taken[tag["name"]]}: '
+                    f'name {tag["name"]} is already taken'))
+                continue
+            taken[tag['name']] = slug
+            new_tags.append(Tag(**tag))
+        tags.update((tag.slug, tag)
+                    for tag in Tag.objects.bulk_create(new_tags))
+        return tags
+
+    @staticmethod
+    def resolve_ingredients(batch):
+        exported = {(item['name'], item['measurement_unit'])
+                    for row in batch for item in row['ingredients']}
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=name, measurement_unit=unit)
+             for name, unit in exported),
+            ignore_conflicts=True)
+        ingredients = {}
+        for ingredient in Ingredient.objects.filter(
+                name__in={name for name, _ in exported}).values_list(
+                'name', 'measurement_unit', 'id'):
+            ingredients[ingredient[:2]] = ingredient[2]
+        return ingredients
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recieps.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds follow feed timelines from Subscription. Recipes of '
+            'authors with too many followers are read at request time and '
+            'are not stored in timelines.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, nargs='*', dest='users',
+                            help='Rebuild only feeds of these user ids')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = rebuild_feeds(options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Feeds rebuilt: {created} rows'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recieps.cart import rebuild_carts
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds materialized shopping cart totals from ShoppingList'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, nargs='*', dest='users',
+                            help='Rebuild only carts of these user ids')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = rebuild_carts(options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Shopping carts rebuilt: {created} rows'))
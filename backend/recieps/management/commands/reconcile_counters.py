@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recieps.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = ('Recalculates denormalized recipe and user counters and '
+            'recipe tag masks')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile_counters()
+        for counter, rows in fixed.items():
+            self.stdout.write(f'{counter}: {rows} rows fixed')
+        self.stdout.write(self.style.SUCCESS('Counters reconciled'))
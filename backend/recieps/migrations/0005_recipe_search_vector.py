@@ -0,0 +1,67 @@
+# Generated by Django 5.0.6 on 2026-10-17 09:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+FTS_TABLE = 'recieps_recipe_fts'
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['search_vector'], name='recipe_search_vector_idx')
+
+
+def create_search_index(apps, schema_editor):
+    Recipe = apps.get_model('recieps', 'Recipe')
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.add_index(Recipe, SEARCH_INDEX)
+        schema_editor.execute(
+            'UPDATE recieps_recipe SET search_vector = '
+            "setweight(to_tsvector('russian', name), 'A') || "
+            "setweight(to_tsvector('russian', text), 'B') || "
+            "setweight(to_tsvector('english', name), 'A') || "
+            "setweight(to_tsvector('english', text), 'B')"
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            "name, text, tokenize='porter unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+            'SELECT id, name, text FROM recieps_recipe'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    Recipe = apps.get_model('recieps', 'Recipe')
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.remove_index(Recipe, SEARCH_INDEX)
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recieps', '0004_alter_shoppinglist_options_delete_subscription'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='recipe',
+                    index=SEARCH_INDEX,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+    ]
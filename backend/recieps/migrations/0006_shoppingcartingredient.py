@@ -0,0 +1,52 @@
+# Generated by Django 5.0.6 on 2026-10-17 05:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_carts(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recieps', 'RecipeIngredient')
+    ShoppingCartIngredient = apps.get_model('recieps',
+                                            'ShoppingCartIngredient')
+    totals = RecipeIngredient.objects.filter(
+        recipe__shoppinglist__isnull=False
+    ).values(
+        'recipe__shoppinglist__user_id', 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+    ShoppingCartIngredient.objects.bulk_create(
+        ShoppingCartIngredient(user_id=row['recipe__shoppinglist__user_id'],
+                               ingredient_id=row['ingredient_id'],
+                               amount=row['total'])
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recieps', '0005_recipe_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(default=0)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recieps.ingredient')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredients', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в корзине',
+                'verbose_name_plural': 'Ингредиенты в корзине',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_cart_ingredient'),
+        ),
+        migrations.RunPython(fill_carts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-17 05:58
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recieps', 'Recipe', 'favorites_count', 'recieps', 'FavoriteRecipes',
+     'recipe'),
+    ('recieps', 'Recipe', 'in_carts_count', 'recieps', 'ShoppingList',
+     'recipe'),
+    ('users', 'User', 'recipes_count', 'recieps', 'Recipe', 'author'),
+    ('users', 'User', 'followers_count', 'users', 'Subscription', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for app, model, field, source_app, source, source_field in COUNTERS:
+        Source = apps.get_model(source_app, source)
+        apps.get_model(app, model).objects.update(**{field: Coalesce(
+            Subquery(
+                Source.objects.filter(
+                    **{source_field: OuterRef('pk')}
+                ).order_by().values(source_field).annotate(
+                    total=Count('pk')).values('total'),
+                output_field=IntegerField()
+            ), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recieps', '0006_shoppingcartingredient'),
+        ('users', '0004_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число избранного'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число добавлений в корзину'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.6 on 2026-10-17 06:19
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+SELECTED = (
+    ('FavoriteRecipes', 'favorites_count'),
+    ('ShoppingList', 'in_carts_count'),
+)
+
+
+def remove_duplicates(apps, schema_editor):
+    Recipe = apps.get_model('recieps', 'Recipe')
+    for model, counter in SELECTED:
+        Selected = apps.get_model('recieps', model)
+        duplicates = Selected.objects.values('user_id', 'recipe_id').annotate(
+            keep=Min('pk'), total=Count('pk')
+        ).filter(total__gt=1).order_by()
+        for row in duplicates:
+            Selected.objects.filter(
+                user_id=row['user_id'], recipe_id=row['recipe_id']
+            ).exclude(pk=row['keep']).delete()
+            Recipe.objects.filter(pk=row['recipe_id']).update(**{
+                counter: Selected.objects.filter(
+                    recipe_id=row['recipe_id']).count()})
+            if model == 'ShoppingList':
+                rebuild_cart(apps, row['user_id'])
+
+
+def rebuild_cart(apps, user_id):
+    RecipeIngredient = apps.get_model('recieps', 'RecipeIngredient')
+    ShoppingCartIngredient = apps.get_model('recieps',
+                                            'ShoppingCartIngredient')
+    ShoppingCartIngredient.objects.filter(user_id=user_id).delete()
+    totals = RecipeIngredient.objects.filter(
+        recipe__shoppinglist__user_id=user_id
+    ).values('ingredient_id').annotate(total=Sum('amount')).order_by()
+    ShoppingCartIngredient.objects.bulk_create(
+        ShoppingCartIngredient(user_id=user_id,
+                               ingredient_id=row['ingredient_id'],
+                               amount=row['total'])
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recieps', '0008_dataversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favoriterecipes',
+            constraint=models.UniqueConstraint(fields=('recipe', 'user'), name='favoriterecipes_unique_user_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglist',
+            constraint=models.UniqueConstraint(fields=('recipe', 'user'), name='shoppinglist_unique_user_recipe'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.0.6 on 2026-10-17 06:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+FANOUT_MAX_FOLLOWERS = 1000
+BACKFILL_SIZE = 100
+
+
+def fill_feeds(apps, schema_editor):
+    Subscription = apps.get_model('users', 'Subscription')
+    Recipe = apps.get_model('recieps', 'Recipe')
+    FeedEntry = apps.get_model('recieps', 'FeedEntry')
+    recipes = Recipe.objects.filter(
+        author__followers_count__lt=FANOUT_MAX_FOLLOWERS
+    ).annotate(row_number=Window(
+        RowNumber(),
+        partition_by=F('author_id'),
+        order_by=(F('created_at').desc(), F('id').desc())
+    )).filter(row_number__lte=BACKFILL_SIZE).values_list(
+        'id', 'author_id', 'created_at')
+    followers = {}
+    for user_id, author_id in Subscription.objects.values_list(
+            'user_id', 'author_id').iterator():
+        followers.setdefault(author_id, []).append(user_id)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                   created_at=created_at)
+         for recipe_id, author_id, created_at in recipes.iterator()
+         for user_id in followers.get(author_id, ())),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recieps', '0009_selectedrecipes_unique_user_recipe'),
+        ('users', '0004_user_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-created_at'], name='recipe_author_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recieps.recipe'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-created_at', '-recipe'], name='feed_entry_user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
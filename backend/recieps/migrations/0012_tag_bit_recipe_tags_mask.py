@@ -0,0 +1,53 @@
+# Generated by Django 5.0.6 on 2026-10-17 06:40
+
+from django.db import migrations, models
+
+MAX_TAGS = 63
+
+
+def fill_tags_masks(apps, schema_editor):
+    Tag = apps.get_model('recieps', 'Tag')
+    Recipe = apps.get_model('recieps', 'Recipe')
+    tags = list(Tag.objects.order_by('id'))
+    if len(tags) > MAX_TAGS:
+        raise RuntimeError(f'Маска тегов вмещает не больше {MAX_TAGS} '
+                           f'тегов, в базе {len(tags)}.')
+    for bit, tag in enumerate(tags):
+        tag.bit = bit
+    Tag.objects.bulk_update(tags, ('bit',))
+    masks = {}
+    for recipe_id, bit in Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag__bit').iterator():
+        masks[recipe_id] = masks.get(recipe_id, 0) | 1 << bit
+    Recipe.objects.bulk_update(
+        [Recipe(id=recipe_id, tags_mask=mask)
+         for recipe_id, mask in masks.items()],
+        ('tags_mask',),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recieps', '0011_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Маска тегов'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='Бит в маске тегов'),
+        ),
+        migrations.RunPython(fill_tags_masks, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, unique=True, verbose_name='Бит в маске тегов'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-17 06:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recieps', '0012_tag_bit_recipe_tags_mask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favoriterecipes',
+            index=models.Index(fields=['user', 'recipe'], name='favoriterecipes_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-created_at', '-id'], include=('tags_mask',), name='recipe_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglist',
+            index=models.Index(fields=['user', 'recipe'], name='shoppinglist_user_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-17 07:21
+
+from django.db import migrations, models
+
+from recieps.images import has_derivatives
+
+BATCH_SIZE = 1000
+
+
+def mark_recipes_with_derivatives(apps, schema_editor):
+    Recipe = apps.get_model('recieps', 'Recipe')
+    images = {}
+    ready = []
+    for recipe in Recipe.objects.exclude(image='').only(
+            'id', 'image').iterator():
+        if recipe.image.name not in images:
+            images[recipe.image.name] = has_derivatives(recipe.image)
+        if images[recipe.image.name]:
+            ready.append(recipe.id)
+    for start in range(0, len(ready), BATCH_SIZE):
+        Recipe.objects.filter(
+            pk__in=ready[start:start + BATCH_SIZE]
+        ).update(has_image_derivatives=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recieps', '0013_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='has_image_derivatives',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Есть уменьшенные копии изображения'),
+        ),
+        migrations.RunPython(mark_recipes_with_derivatives,
+                             migrations.RunPython.noop),
+    ]
@@ -1,12 +1,15 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
-from .constants import (MAX_INGREDIENT_LENGTH, MAX_MEASURMENT_UNIT_LENGTH,
-                        MAX_RECIPE_NAME_LENGTH, MAX_TAG_NAME_LENGTH,
-                        MAX_TAG_SLUG_LENGTH)
+from .constants import (MAX_DATA_VERSION_NAME_LENGTH, MAX_INGREDIENT_LENGTH,
+                        MAX_MEASURMENT_UNIT_LENGTH, MAX_RECIPE_NAME_LENGTH,
+                        MAX_TAG_NAME_LENGTH, MAX_TAG_SLUG_LENGTH, MAX_TAGS)
 
 User = get_user_model()
 
@@ -31,18 +34,57 @@ class Ingredient(models.Model):
         return self.name
 
 
+class TagQuerySet(models.QuerySet):
+    def free_bits(self, count):
+        used = set(self.model.objects.values_list('bit', flat=True))
+        free = [bit for bit in range(MAX_TAGS) if bit not in used][:count]
+        if len(free) < count:
+            raise ValidationError(f'Нельзя создать больше {MAX_TAGS} тегов.')
+        return free
+
+    def assign_bits(self, tags):
+        tags = [tag for tag in tags if tag.bit is None]
+        if not tags:
+            return
+        DataVersion.lock('tags')
+        for tag, bit in zip(tags, self.free_bits(len(tags))):
+            tag.bit = bit
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic():
+            self.assign_bits(objs)
+            return super().bulk_create(objs, *args, **kwargs)
+
+
 class Tag(models.Model):
     name = models.CharField(max_length=MAX_TAG_NAME_LENGTH, unique=True)
     color = ColorField(default='#FFFFFF', verbose_name='Цвет')
     slug = models.SlugField(max_length=MAX_TAG_SLUG_LENGTH,
                             unique=True,
                             verbose_name='SLUG')
+    bit = models.PositiveSmallIntegerField('Бит в маске тегов',
+                                           unique=True,
+                                           editable=False)
+
+    objects = TagQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Тэг'
         verbose_name_plural = 'Тэги'
         ordering = ('name',)
 
+    def clean(self):
+        if self.bit is None:
+            Tag.objects.free_bits(1)
+
+    def save(self, *args, **kwargs):
+        if self.bit is not None:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            Tag.objects.assign_bits([self])
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -61,11 +103,32 @@ class Recipe(models.Model):
                                on_delete=models.CASCADE,
                                related_name='recipes')
     created_at = models.DateTimeField(default=timezone.now, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    favorites_count = models.PositiveIntegerField('Число избранного',
+                                                  default=0,
+                                                  editable=False)
+    in_carts_count = models.PositiveIntegerField('Число добавлений в корзину',
+                                                 default=0,
+                                                 editable=False)
+    tags_mask = models.BigIntegerField('Маска тегов',
+                                       default=0,
+                                       editable=False)
+    has_image_derivatives = models.BooleanField(
+        'Есть уменьшенные копии изображения', default=False, editable=False)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-created_at',)
+        indexes = [
+            GinIndex(fields=('search_vector',),
+                     name='recipe_search_vector_idx'),
+            models.Index(fields=('-created_at', '-id'),
+                         name='recipe_created_idx',
+                         include=('tags_mask',)),
+            models.Index(fields=('author', '-created_at'),
+                         name='recipe_author_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -85,24 +148,132 @@ class SelectedRecipes(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
     class Meta:
-        ordering = ('user', 'recipe',)
         constraints = [
             models.UniqueConstraint(
                 fields=('recipe', 'user',),
-                name='unique_user_recipe',)
+                name='%(class)s_unique_user_recipe',)
+        ]
+        indexes = [
+            models.Index(fields=('user', 'recipe'),
+                         name='%(class)s_user_idx'),
         ]
         abstract = True
 
 
 class FavoriteRecipes(SelectedRecipes):
-    class Meta:
+    class Meta(SelectedRecipes.Meta):
         default_related_name = 'favorites'
         verbose_name = 'Избранные'
         verbose_name_plural = 'Избранные'
 
 
 class ShoppingList(SelectedRecipes):
-    class Meta:
+    class Meta(SelectedRecipes.Meta):
         default_related_name = 'shoppinglist'
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списоки покупок'
+
+
+class ShoppingCartIngredient(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='cart_ingredients')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    amount = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзине'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient',),
+                name='unique_cart_ingredient',)
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient.name} - {self.amount}'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    recipe = models.ForeignKey(Recipe,
+                               on_delete=models.CASCADE,
+                               related_name='feed_entries')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe',),
+                name='unique_feed_entry',)
+        ]
+        indexes = [
+            models.Index(fields=('user', '-created_at', '-recipe'),
+                         name='feed_entry_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.recipe}'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(Recipe,
+                               on_delete=models.CASCADE,
+                               related_name='similar_entries')
+    similar = models.ForeignKey(Recipe,
+                                on_delete=models.CASCADE,
+                                related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar',),
+                name='unique_similar_recipe',)
+        ]
+        indexes = [
+            models.Index(fields=('recipe', '-score'),
+                         name='similar_recipe_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} - {self.similar}'
+
+
+class DataVersion(models.Model):
+    name = models.CharField(max_length=MAX_DATA_VERSION_NAME_LENGTH,
+                            unique=True)
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    @classmethod
+    def bump(cls, name):
+        updated = cls.objects.filter(name=name).update(
+            version=models.F('version') + 1, updated_at=timezone.now())
+        if not updated:
+            cls.objects.get_or_create(name=name)
+
+    @classmethod
+    def get(cls, name):
+        return cls.objects.get_or_create(name=name)[0]
+
+    @classmethod
+    def lock(cls, name):
+        return cls.objects.select_for_update().get_or_create(name=name)[0]
+
+    @classmethod
+    async def aget(cls, name):
+        return (await cls.objects.aget_or_create(name=name))[0]
+
+    def __str__(self):
+        return f'{self.name} - {self.version}'
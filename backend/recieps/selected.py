@@ -0,0 +1,54 @@
+from django.db import connection
+
+from recieps.cart import add_recipes_to_cart, remove_recipes_from_cart
+from recieps.counters import RECIPE_COUNTERS, shift_counters
+from recieps.models import Recipe, ShoppingList
+
+RECIPE_TABLE = Recipe._meta.db_table
+
+
+def returned_recipe_ids(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def insert_selected(model, user_id, recipe_ids):
+    if not recipe_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    return returned_recipe_ids(
+        f'INSERT INTO {model._meta.db_table} (user_id, recipe_id) '
+        f'SELECT %s, id FROM {RECIPE_TABLE} WHERE id IN ({placeholders}) '
+        'ON CONFLICT (recipe_id, user_id) DO NOTHING '
+        'RETURNING recipe_id',
+        [user_id, *recipe_ids]
+    )
+
+
+def delete_selected(model, user_id, recipe_ids):
+    if not recipe_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    return returned_recipe_ids(
+        f'DELETE FROM {model._meta.db_table} '
+        f'WHERE user_id = %s AND recipe_id IN ({placeholders}) '
+        'RETURNING recipe_id',
+        [user_id, *recipe_ids]
+    )
+
+
+def add_selected(model, user_id, recipe_ids):
+    added = insert_selected(model, user_id, recipe_ids)
+    shift_counters(Recipe, added, RECIPE_COUNTERS[model], 1)
+    if model is ShoppingList:
+        add_recipes_to_cart(user_id, added)
+    return added
+
+
+def remove_selected(model, user_id, recipe_ids):
+    removed = delete_selected(model, user_id, recipe_ids)
+    shift_counters(Recipe, removed, RECIPE_COUNTERS[model], -1)
+    if model is ShoppingList:
+        remove_recipes_from_cart(user_id, removed)
+    return removed
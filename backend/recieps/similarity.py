@@ -0,0 +1,146 @@
+import heapq
+import math
+from collections import defaultdict
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Count, Window
+from django.db.models.functions import RowNumber
+
+from recieps.constants import (SIMILAR_MAX_INGREDIENT_RECIPES,
+                               SIMILAR_RECIPES_COUNT)
+from recieps.models import Recipe, RecipeIngredient, SimilarRecipe
+
+
+def recipe_vectors(recipe_ingredients):
+    vectors = defaultdict(set)
+    for recipe_id, ingredient_id in recipe_ingredients.values_list(
+            'recipe_id', 'ingredient_id').iterator():
+        vectors[recipe_id].add(ingredient_id)
+    return vectors
+
+
+def ingredient_weights(frequencies, total):
+    return {ingredient: math.log(1 + total / frequency)
+            for ingredient, frequency in frequencies.items()
+            if frequency <= SIMILAR_MAX_INGREDIENT_RECIPES}
+
+
+def vector_norm(ingredients, weights):
+    return math.sqrt(sum(weights.get(ingredient, 0) ** 2
+                         for ingredient in ingredients))
+
+
+def cosine_scores(ingredients, postings, weights, norms, recipe_id):
+    dots = defaultdict(float)
+    for ingredient in ingredients:
+        weight = weights.get(ingredient)
+        if weight is None:
+            continue
+        for other in postings.get(ingredient, ()):
+            dots[other] += weight * weight
+    dots.pop(recipe_id, None)
+    norm = norms[recipe_id]
+    return {other: dot / (norm * norms[other])
+            for other, dot in dots.items()}
+
+
+def top_scores(scores):
+    return heapq.nlargest(SIMILAR_RECIPES_COUNT, scores.items(),
+                          key=itemgetter(1))
+
+
+def build_similar_recipes():
+    vectors = recipe_vectors(RecipeIngredient.objects.all())
+    postings = defaultdict(list)
+    for recipe_id, ingredients in vectors.items():
+        for ingredient in ingredients:
+            postings[ingredient].append(recipe_id)
+    weights = ingredient_weights(
+        {ingredient: len(recipes) for ingredient, recipes in postings.items()},
+        Recipe.objects.count())
+    norms = {recipe_id: vector_norm(ingredients, weights)
+             for recipe_id, ingredients in vectors.items()}
+    entries = [
+        SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id, score=score)
+        for recipe_id, ingredients in vectors.items()
+        for similar_id, score in top_scores(cosine_scores(
+            ingredients, postings, weights, norms, recipe_id))
+    ]
+    with transaction.atomic():
+        SimilarRecipe.objects.all().delete()
+        return len(SimilarRecipe.objects.bulk_create(entries,
+                                                     batch_size=1000))
+
+
+def ingredient_frequencies(ingredients):
+    return dict(RecipeIngredient.objects.filter(
+        ingredient__in=ingredients
+    ).values('ingredient_id').annotate(
+        total=Count('recipe_id', distinct=True)
+    ).values_list('ingredient_id', 'total').order_by())
+
+
+def similar_scores(recipe_ids):
+    if not recipe_ids:
+        return {}
+    recipe_ingredients = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids)
+    total = Recipe.objects.count()
+    weights = ingredient_weights(
+        ingredient_frequencies(recipe_ingredients.values('ingredient_id')),
+        total)
+    candidates = RecipeIngredient.objects.filter(
+        recipe__in=RecipeIngredient.objects.filter(
+            ingredient__in=list(weights)).values('recipe_id'))
+    vectors = recipe_vectors(candidates)
+    weights.update(ingredient_weights(
+        ingredient_frequencies(candidates.values('ingredient_id')), total))
+    postings = defaultdict(list)
+    for other, ingredients in vectors.items():
+        for ingredient in ingredients:
+            postings[ingredient].append(other)
+    norms = {other: vector_norm(ingredients, weights)
+             for other, ingredients in vectors.items()}
+    return {recipe_id: (cosine_scores(vectors[recipe_id], postings, weights,
+                                      norms, recipe_id)
+                        if recipe_id in vectors else {})
+            for recipe_id in recipe_ids}
+
+
+def replace_similar_recipes(scores):
+    SimilarRecipe.objects.filter(recipe__in=list(scores)).delete()
+    SimilarRecipe.objects.bulk_create(
+        [SimilarRecipe(recipe_id=recipe_id, similar_id=other, score=score)
+         for recipe_id, recipe_scores in scores.items()
+         for other, score in top_scores(recipe_scores)],
+        batch_size=1000
+    )
+
+
+@transaction.atomic
+def refresh_similar_recipes(recipe_id):
+    scores = similar_scores([recipe_id])[recipe_id]
+    listed = dict(SimilarRecipe.objects.filter(
+        similar_id=recipe_id).values_list('recipe_id', 'score'))
+    demoted = [other for other, score in listed.items()
+               if scores.get(other, 0) < score]
+    promoted = [other for other in scores if other not in demoted]
+    replace_similar_recipes({recipe_id: scores, **similar_scores(demoted)})
+    SimilarRecipe.objects.filter(similar_id=recipe_id,
+                                 recipe__in=promoted).delete()
+    SimilarRecipe.objects.bulk_create(
+        [SimilarRecipe(recipe_id=other, similar_id=recipe_id,
+                       score=scores[other])
+         for other in promoted],
+        batch_size=1000
+    )
+    trimmed = SimilarRecipe.objects.filter(
+        recipe__in=promoted
+    ).annotate(position=Window(
+        RowNumber(),
+        partition_by='recipe_id',
+        order_by=('-score', 'similar_id')
+    )).filter(position__gt=SIMILAR_RECIPES_COUNT)
+    SimilarRecipe.objects.filter(
+        id__in=list(trimmed.values_list('id', flat=True))).delete()
@@ -0,0 +1,44 @@
+from functools import reduce
+from operator import or_
+
+from django.db.models import F
+from django.db.models.lookups import Exact, GreaterThan
+
+from recieps.models import Recipe
+
+
+def tags_mask(tags):
+    return reduce(or_, (1 << tag.bit for tag in tags), 0)
+
+
+def has_any_tags(mask):
+    return GreaterThan(F('tags_mask').bitand(mask), 0)
+
+
+def has_all_tags(mask):
+    return Exact(F('tags_mask').bitand(mask), mask)
+
+
+def rebuild_tags_masks(recipes=None):
+    current = Recipe.objects.all()
+    links = Recipe.tags.through.objects.all()
+    if recipes is not None:
+        current = current.filter(pk__in=recipes)
+        links = links.filter(recipe__in=recipes)
+    masks = dict.fromkeys(current.values_list('id', flat=True), 0)
+    for recipe_id, bit in links.values_list('recipe_id',
+                                            'tag__bit').iterator():
+        masks[recipe_id] |= 1 << bit
+    changed = [
+        Recipe(id=recipe_id, tags_mask=masks[recipe_id])
+        for recipe_id, mask in current.values_list(
+            'id', 'tags_mask').iterator()
+        if masks[recipe_id] != mask
+    ]
+    Recipe.objects.bulk_update(changed, ('tags_mask',), batch_size=1000)
+    return len(changed)
+
+
+def clear_tag_bit(bit):
+    Recipe.objects.filter(has_any_tags(1 << bit)).update(
+        tags_mask=F('tags_mask') - (1 << bit))
@@ -0,0 +1,35 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+executor = (
+    ThreadPoolExecutor(max_workers=settings.BACKGROUND_TASK_WORKERS,
+                       thread_name_prefix='background')
+    if settings.BACKGROUND_TASK_WORKERS else None
+)
+
+
+def run_task(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась с ошибкой',
+                         func.__name__)
+    finally:
+        connection.close()
+
+
+def run_in_background(func, *args):
+    if executor is None or connection.vendor == 'sqlite':
+        func(*args)
+    else:
+        executor.submit(run_task, func, *args)
+
+
+def run_on_commit(func, *args):
+    transaction.on_commit(partial(run_in_background, func, *args))
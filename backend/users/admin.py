@@ -5,7 +5,8 @@ from users.models import User
 
 
 class UserAdmin(BaseUserAdmin):
-    list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff')
+    list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff',
+                    'recipes_count', 'followers_count')
     list_filter = ('first_name', 'last_name', 'email')
 
 
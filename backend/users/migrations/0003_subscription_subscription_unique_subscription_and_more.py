@@ -9,6 +9,7 @@ class Migration(migrations.Migration):
 
     dependencies = [
         ('users', '0002_alter_user_options'),
+        ('recieps', '0004_alter_shoppinglist_options_delete_subscription'),
     ]
 
     operations = [
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-17 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['author', 'user'], name='subscription_author_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['first_name', 'last_name', 'username'], name='user_name_ordering_idx'),
+        ),
+    ]
@@ -24,6 +24,12 @@ class User(AbstractUser):
     last_name = models.CharField('last name',
                                  max_length=MAX_LASTNAME_LENGTH,
                                  blank=False)
+    recipes_count = models.PositiveIntegerField('Число рецептов',
+                                                default=0,
+                                                editable=False)
+    followers_count = models.PositiveIntegerField('Число подписчиков',
+                                                  default=0,
+                                                  editable=False)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name',)
 
@@ -31,6 +37,10 @@ class User(AbstractUser):
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('first_name', 'last_name', 'username',)
+        indexes = [
+            models.Index(fields=('first_name', 'last_name', 'username'),
+                         name='user_name_ordering_idx'),
+        ]
 
     def __str__(self):
         return self.username
@@ -67,6 +77,10 @@ class Subscription(models.Model):
                 name='user_not_subscribe_self',
             ),
         ]
+        indexes = [
+            models.Index(fields=('author', 'user'),
+                         name='subscription_author_user_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} подписан на {self.author.username}'